@@ -1,14 +1,20 @@
+import click
 from flask import Flask, redirect, url_for
 import os
 from werkzeug.security import generate_password_hash
 from application.config import LocalDevelopmentConfig, DB_PATH
-from application.models import db, User
+from application.models import db, User, Appointment, ArchivedAppointment
 from application.controllers import auth_bp, admin_bp, doctor_bp, patient_bp
 from flask_login import LoginManager
 from flask_wtf import CSRFProtect
 from flask_wtf.csrf import generate_csrf
 from sqlalchemy.exc import SQLAlchemyError
 from application.api import api_bp
+from application.inventory import ensure_inventory, rebuild_inventory
+from application.recurring import fold_repeating_rows, describe_weekdays
+from application.cache import configure_caches
+from application.export import stream_export, FORMATS as EXPORT_FORMATS
+from application import coherence, holds, search, appointment_search, patient_lookup, stats, rollups, archive
 
 app=None
 csrf= CSRFProtect()
@@ -27,11 +33,21 @@ def create_app():
         os.makedirs(db_dir,exist_ok=True)
     
     db.init_app(app)
+    configure_caches(app)
 
    
     with app.app_context():
         db.create_all()
         _ensure_default_admin()
+        ensure_inventory()
+    archive.init_app(app)
+    coherence.init_app(app)
+    holds.init_app(app)
+    search.init_app(app)
+    appointment_search.init_app(app)
+    patient_lookup.init_app(app)
+    stats.init_app(app)
+    rollups.init_app(app)
 
     # Setup Flask-Login
     login_manager = LoginManager()
@@ -62,6 +78,81 @@ def create_app():
     def home():
         return redirect(url_for('auth.index'))
 
+    @app.cli.command("rebuild-slots")
+    def rebuild_slots():
+        """Re-derive the slot inventory from availability and appointments."""
+        count = rebuild_inventory()
+        print(f"Slot inventory rebuilt: {count} slots")
+
+    @app.cli.command("sweep-holds")
+    def sweep_holds():
+        """Free every slot hold whose TTL has expired."""
+        count = holds.sweep_expired_holds()
+        print(f"Expired holds released on {count} doctor/day schedules")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search():
+        """Re-index doctors and patients for search."""
+        if not search.install_index():
+            print("This SQLite build has no FTS5; search uses substring matching")
+            return
+        print(f"Doctor search index rebuilt: {search.rebuild_index()} doctors")
+        if patient_lookup.install_index():
+            print(f"Patient name index rebuilt: {patient_lookup.rebuild_index()} patients")
+
+    @app.cli.command("fold-availability")
+    @click.option("--min-weeks", default=3, show_default=True, help="Shortest weekly run to fold.")
+    @click.option("--dry-run", is_flag=True, help="Only report what would be folded.")
+    def fold_availability(min_weeks, dry_run):
+        """Replace weekly repeating availability rows with recurring templates."""
+        templates = fold_repeating_rows(min_weeks=min_weeks, dry_run=dry_run)
+        for t in templates:
+            print(f"doctor {t.doctor_id}: {describe_weekdays(t.weekdays)} "
+                  f"{t.start_time.strftime('%H:%M')}-{t.end_time.strftime('%H:%M')} "
+                  f"({t.valid_from} .. {t.valid_until})")
+        print(f"{'Would fold' if dry_run else 'Folded'} into {len(templates)} templates")
+
+    @app.cli.command("reconcile-stats")
+    def reconcile_stats():
+        """Recount the dashboard counters from the tables."""
+        row = stats.reconcile()
+        print(f"Counters: {row.doctors} doctors, {row.patients} patients, {row.appointments} appointments "
+              f"({row.booked} booked, {row.completed} completed, {row.cancelled} cancelled)")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups():
+        """Recompute the daily appointment rollups from the appointment tables."""
+        print(f"Rebuilt {rollups.rebuild()} daily rollup rows")
+
+    @app.cli.command("export-appointments")
+    @click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="ndjson", show_default=True)
+    @click.option("--output", type=click.File("w"), default="-", help="File to write (default: stdout).")
+    @click.option("--status", help="Only appointments with this status.")
+    @click.option("--from", "start", type=click.DateTime(["%Y-%m-%d"]), help="First date (YYYY-MM-DD).")
+    @click.option("--to", "end", type=click.DateTime(["%Y-%m-%d"]), help="Last date (YYYY-MM-DD).")
+    def export_appointments(fmt, output, status, start, end):
+        """Stream every appointment, archived ones included, with doctor, patient and treatment fields."""
+        q, archived = Appointment.query, ArchivedAppointment.query
+        if status:
+            q = q.filter(Appointment.status == status)
+            archived = archived.filter(ArchivedAppointment.status == status)
+        if start:
+            q = q.filter(Appointment.appt_date >= start.date())
+            archived = archived.filter(ArchivedAppointment.appt_date >= start.date())
+        if end:
+            q = q.filter(Appointment.appt_date <= end.date())
+            archived = archived.filter(ArchivedAppointment.appt_date <= end.date())
+        for chunk in stream_export(q, fmt, archived):
+            output.write(chunk)
+
+    @app.cli.command("archive-appointments")
+    @click.option("--before", type=click.DateTime(["%Y-%m-%d"]),
+                  help="Archive appointments dated before this day (default: ARCHIVE_HORIZON_DAYS ago).")
+    def archive_appointments(before):
+        """Move old appointments and their treatments into the archive tables."""
+        cutoff = before.date() if before else archive.horizon_cutoff()
+        print(f"Archived {archive.archive_appointments(cutoff)} appointments dated before {cutoff}")
+
     return app
 
 
@@ -1,67 +1,97 @@
-from datetime import datetime, date, time
-from flask import Blueprint, jsonify, request, abort
+from datetime import datetime, date, time, timedelta
+from flask import Blueprint, jsonify, request, abort, url_for, Response, stream_with_context
 from flask_login import login_required, current_user
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_
-from application.models import db, User, Doctor, Patient, Appointment, Treatment
+from application.models import db, User, Doctor, Patient, Appointment, Department, ArchivedAppointment
 from application.controllers import role_required
+from application.cache import cache_stats
+from application.availability import free_slots_matrix, earliest_free_slots, department_doctor_ids
+from application.holds import held_by_other
+from application.recurring import expand_windows
+from application.bulk_availability import add_windows
+from application.search import filter_doctors
+from application.autocomplete import doctor_autocomplete
+from application.pagination import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from application.export import stream_export, FORMATS as EXPORT_FORMATS
+from application.appointment_batch import run_batch, BatchError, status_change_error, delete_error
+from application.conditional import entity_tag, appointment_version, patient_version, doctors_version
+from application.rollups import daily_series, GROUPS as ROLLUP_GROUPS
+from application.archive import keyset_page_with_archive, archived_through, with_names as with_archived_names
+from application.dashboards import patient_dashboard, doctor_dashboard, admin_dashboard, STATUSES
+from application.stats import STATUS_COLUMNS as STATS_COLUMNS
+from .serializers import doctor_to_dict, patient_to_dict, appointment_to_dict
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 
 # Helper functions
 
-def doctor_to_dict(doctor):
-    return {
-        'id': doctor.id,
-        'name': doctor.user.name if doctor.user else None,
-        'email': doctor.user.email if doctor.user else None,
-        'specialization': doctor.specialization,
-        'department': doctor.department.name if doctor.department else None,
-        'is_blacklisted': bool(doctor.is_blacklisted),
-    }
-
-def patient_to_dict(patient):
-    return {
-        'id': patient.id,
-        'name': patient.user.name if patient.user else None,
-        'email': patient.user.email if patient.user else None,
-        'phone': patient.phone,
-        'address': patient.address,
-        'age': patient.age,
-        'gender': patient.gender,
-        'is_blacklisted': bool(patient.is_blacklisted),
-    }
-
-def treatment_to_dict(t: Treatment | None):
-    if not t:
-        return None
-    return {
-        "id": t.id,
-        "diagnosis": t.diagnosis,
-        "prescription": t.prescription,
-        "notes": t.notes,
-    }
-
-def appointment_to_dict(a: Appointment):
-    return {
-            "id": a.id,
-            "date": a.appt_date.isoformat() if a.appt_date else None,
-            "time": a.appt_time.strftime("%H:%M") if a.appt_time else None,
-            "status": a.status,
-            "note": a.notes,
-            "doctor_id": a.doctor_id,
-            "doctor_name": a.doctor.user.name if a.doctor and a.doctor.user else None,
-            "patient_id": a.patient_id,
-            "patient_name": a.patient.user.name if a.patient and a.patient.user else None,
-            "treatment": treatment_to_dict(a.treatment),
-        }
-
 def bad_request(message, status_code=400):
     response = jsonify({'error': message})
     response.status_code = status_code
     return response
 
+def parse_date_range(default_days=7, max_days=90):
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD, defaulting to the next `default_days` bookable days.
+    # Raises ValueError with a message fit for bad_request()
+    start_str=request.args.get('from')
+    end_str=request.args.get('to')
+    try:
+        start=date.fromisoformat(start_str) if start_str else date.today()+timedelta(days=1)
+        end=date.fromisoformat(end_str) if end_str else start+timedelta(days=default_days-1)
+    except ValueError:
+        raise ValueError("Invalid date format, use YYYY-MM-DD")
+    if end<start:
+        raise ValueError("'to' must not be before 'from'")
+    if (end-start).days>max_days:
+        raise ValueError(f"Date range cannot exceed {max_days} days")
+    return start, end
+
+def parse_page_args():
+    # ?limit=N&cursor=..., raises ValueError with a message fit for bad_request()
+    limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit<1 or limit>MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit, request.args.get('cursor') or None
+
+def parse_fields(serializer):
+    # ?fields=id,date,status narrows the response to those keys, read as plain
+    # columns; raises ValueError with a message fit for bad_request()
+    names=[f.strip() for f in (request.args.get('fields') or '').split(',') if f.strip()]
+    return serializer.sparse(names) if names else serializer
+
+def page_response(items, next_cursor, limit):
+    # The body stays a plain list; the next page is linked from the Link header
+    response=jsonify(items)
+    if next_cursor:
+        args=request.args.to_dict(flat=False)
+        args.update(cursor=next_cursor, limit=limit)
+        response.headers['Link']=f'<{url_for(request.endpoint, _external=True, **request.view_args, **args)}>; rel="next"'
+    return response
+
+def not_modified(etag, last_modified=None):
+    # A bodiless 304 when the client's copy is current (If-None-Match wins over
+    # If-Modified-Since), else None; called before anything is loaded
+    if request.if_none_match:
+        fresh=request.if_none_match.contains(etag)
+    else:
+        fresh=bool(last_modified and request.if_modified_since
+                   and last_modified.replace(microsecond=0)<=request.if_modified_since)
+    return with_validators(Response(status=304), etag, last_modified) if fresh else None
+
+def with_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified=last_modified
+    # cacheable by the client only, and only after revalidating
+    response.cache_control.private=True
+    response.cache_control.no_cache=True
+    return response
+
+def slots_to_dict(days):
+    # {date: [time, ...]} -> {"YYYY-MM-DD": ["HH:MM", ...]}
+    return {day.isoformat(): [t.strftime("%H:%M") for t in times] for day, times in sorted(days.items())}
+
 #**************************************
 #===========API ROUTES=================
 #**************************************
@@ -72,12 +102,38 @@ def bad_request(message, status_code=400):
 @login_required
 def api_list_doctors():
     q= (request.args.get('q') or '').strip()
+    try:
+        limit, cursor=parse_page_args()
+        serialize=parse_fields(doctor_to_dict)
+    except ValueError as e:
+        return bad_request(str(e))
+    etag=entity_tag('doctors', doctors_version(), request.query_string)
+    cached=not_modified(etag)
+    if cached:
+        return cached
     query=Doctor.query.join(User)
+    rank=None
     if q:
-        like=f"%{q}%"
-        query=query.filter(or_(User.name.ilike(like), Doctor.specialization.ilike(like)))
-    doctors=query.order_by(User.name.asc()).all()
-    return jsonify([doctor_to_dict(d) for d in doctors])
+        # ranked by relevance, best match first
+        query,rank=filter_doctors(query, q)
+    order=[*([rank] if rank is not None else []), User.name, Doctor.id]
+    try:
+        doctors, next_cursor=keyset_page(serialize.apply(query), order, cursor, limit)
+    except ValueError as e:
+        return bad_request(str(e))
+    return with_validators(page_response([serialize(d) for d in doctors], next_cursor, limit), etag)
+
+@api_bp.route('/doctors/autocomplete', methods=['GET'])
+@login_required
+def api_doctor_autocomplete():
+    # Type-ahead for the doctor search box, served from memory
+    q=(request.args.get('q') or '').strip()
+    k=request.args.get('k', 10, type=int)
+    if k is None or k<1 or k>10:
+        return bad_request("k must be between 1 and 10")
+    if not q:
+        return jsonify([])
+    return jsonify(doctor_autocomplete.complete(q, k))
 
 @api_bp.route('/doctors/<int:doctor_id>', methods=['GET'])
 @login_required
@@ -85,6 +141,132 @@ def api_get_doctor(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     return jsonify(doctor_to_dict(doctor))
 
+@api_bp.route('/doctors/<int:doctor_id>/availability', methods=['GET'])
+@login_required
+def api_doctor_availability(doctor_id):
+    # Per-date windows plus weekly templates expanded over the range
+    doctor = Doctor.query.get_or_404(doctor_id)
+    try:
+        start, end=parse_date_range()
+    except ValueError as e:
+        return bad_request(str(e))
+    windows=sorted(expand_windows(db.session.connection(), [doctor.id], start, end), key=lambda w: (w[1], w[2], w[3]))
+    return jsonify([{
+        "date": day.isoformat(),
+        "start_time": start_time.strftime("%H:%M"),
+        "end_time": end_time.strftime("%H:%M"),
+        "source": source,
+    } for _, day, start_time, end_time, source in windows])
+
+@api_bp.route('/doctors/<int:doctor_id>/slots', methods=['GET'])
+@login_required
+def api_doctor_slots(doctor_id):
+    # Free slots for every day of the range; today and earlier are never bookable
+    doctor = Doctor.query.get_or_404(doctor_id)
+    if doctor.is_blacklisted:
+        return bad_request("Doctor not available", 400)
+    try:
+        start, end=parse_date_range(max_days=31)
+    except ValueError as e:
+        return bad_request(str(e))
+    days=[start+timedelta(days=i) for i in range((end-start).days+1)]
+    matrix=free_slots_matrix([doctor.id], days)
+    return jsonify({
+        "doctor_id": doctor.id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "slots": slots_to_dict(matrix[doctor.id]),
+    })
+
+@api_bp.route('/doctors/<int:doctor_id>/availability', methods=['POST'])
+@login_required
+def api_add_doctor_availability(doctor_id):
+    # Bulk add: {"windows": [{"date": ..., "start_time": ..., "end_time": ...}, ...]}
+    doctor = Doctor.query.get_or_404(doctor_id)
+    if not (current_user.role == 'admin' or (current_user.role == 'doctor' and current_user.doctor and current_user.doctor.id == doctor.id)):
+        return bad_request("You are not authorized to edit this doctor's availability", 403)
+    data=request.get_json(silent=True) or {}
+    items=data.get('windows')
+    if not isinstance(items, list) or not items:
+        return bad_request("windows must be a non-empty list")
+    try:
+        windows=[(date.fromisoformat(w['date']),
+                  datetime.strptime(w['start_time'], "%H:%M").time(),
+                  datetime.strptime(w['end_time'], "%H:%M").time()) for w in items]
+    except (KeyError, TypeError, ValueError):
+        return bad_request("Each window needs date (YYYY-MM-DD), start_time and end_time (HH:MM)")
+    try:
+        accepted, rejected=add_windows(doctor.id, windows)
+    except ValueError as e:
+        return bad_request(str(e), 413)
+
+    def window_to_dict(w):
+        return {"date": w[0].isoformat(), "start_time": w[1].strftime("%H:%M"), "end_time": w[2].strftime("%H:%M")}
+    return jsonify({
+        "created": [window_to_dict(w) for w in accepted],
+        "rejected": [dict(window_to_dict(w), error=reason) for w, reason in rejected],
+    }), 201 if accepted else 200
+
+#------Slots API--------
+
+@api_bp.route('/slots', methods=['GET'])
+@login_required
+def api_slots():
+    # Several doctors at once: ?doctor_ids=1,2,3 or ?department_id=4
+    dept_id=request.args.get('department_id', type=int)
+    ids_str=request.args.get('doctor_ids') or ''
+    if dept_id:
+        doctor_ids=department_doctor_ids(dept_id)
+    elif ids_str:
+        try:
+            requested={int(x) for x in ids_str.split(',') if x.strip()}
+        except ValueError:
+            return bad_request("doctor_ids must be a comma separated list of ids")
+        if len(requested)>50:
+            return bad_request("At most 50 doctors per request")
+        doctor_ids=[r[0] for r in db.session.query(Doctor.id).filter(Doctor.id.in_(requested), Doctor.is_blacklisted==False).all()]
+    else:
+        return bad_request("doctor_ids or department_id is required")
+    try:
+        start, end=parse_date_range(max_days=31)
+    except ValueError as e:
+        return bad_request(str(e))
+    days=[start+timedelta(days=i) for i in range((end-start).days+1)]
+    matrix=free_slots_matrix(doctor_ids, days)
+    names=dict(db.session.query(Doctor.id, User.name).join(User, Doctor.user_id==User.id).filter(Doctor.id.in_(doctor_ids)).all()) if doctor_ids else {}
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "doctors": [{
+            "doctor_id": doc_id,
+            "doctor_name": names.get(doc_id),
+            "slots": slots_to_dict(matrix[doc_id]),
+        } for doc_id in sorted(doctor_ids, key=lambda i: (names.get(i) or '', i))],
+    })
+
+#------Department API--------
+
+@api_bp.route('/departments/<int:dept_id>/earliest-slots', methods=['GET'])
+@login_required
+def api_department_earliest_slots(dept_id):
+    dept=Department.query.get_or_404(dept_id)
+    limit=request.args.get('n', 5, type=int)
+    if limit is None or limit<1 or limit>100:
+        return bad_request("n must be between 1 and 100")
+    try:
+        start, end=parse_date_range()
+    except ValueError as e:
+        return bad_request(str(e))
+
+    slots=earliest_free_slots(department_doctor_ids(dept.id), start, end, limit)
+    names=dict(db.session.query(Doctor.id, User.name).join(User, Doctor.user_id==User.id).filter(Doctor.id.in_({s[2] for s in slots})).all()) if slots else {}
+    return jsonify([{
+        "doctor_id": doc_id,
+        "doctor_name": names.get(doc_id),
+        "date": day.isoformat(),
+        "time": t.strftime("%H:%M"),
+    } for day, t, doc_id in slots])
+
 #------Patient API--------
 
 @api_bp.route('/patients', methods=['GET'])
@@ -93,38 +275,110 @@ def api_get_current_patient():
     pat=current_user.patient
     if not pat:
         abort(404)
-    return jsonify(patient_to_dict(pat))
+    return patient_response(pat.id)
 
 @api_bp.route('/patients/<int:patient_id>', methods=['GET'])
 @login_required
 def api_get_patient(patient_id):
-    patient=Patient.query.get_or_404(patient_id)
     if current_user.role =='admin':
-        return jsonify(patient_to_dict(patient))
+        return patient_response(patient_id)
     
-    if current_user.role =='patient' and current_user.patient and current_user.patient.id == patient.id:
-        return jsonify(patient_to_dict(patient))
+    if current_user.role =='patient' and current_user.patient and current_user.patient.id == patient_id:
+        return patient_response(patient_id)
 
     abort(404)
 
+def patient_response(patient_id):
+    # One patient, honouring ?fields= and conditional GET
+    try:
+        serialize=parse_fields(patient_to_dict)
+    except ValueError as e:
+        return bad_request(str(e))
+    version=patient_version(patient_id)
+    if version is None:
+        abort(404)
+    last_modified=version[1]
+    etag=entity_tag('patient', patient_id, last_modified, request.args.get('fields'))
+    cached=not_modified(etag, last_modified)
+    if cached:
+        return cached
+    patient=serialize.apply(Patient.query.filter(Patient.id==patient_id)).first_or_404()
+    return with_validators(jsonify(serialize(patient)), etag, last_modified)
+
 #------Appointment API--------
 
+def visible_appointments(model=Appointment):
+    # Appointments (or archived ones) the current user may list, or None for a role without any
+    if current_user.role == 'admin':
+        return model.query
+    if current_user.role == 'doctor' and current_user.doctor:
+        return model.query.filter_by(doctor_id=current_user.doctor.id)
+    if current_user.role == 'patient' and current_user.patient:
+        return model.query.filter_by(patient_id=current_user.patient.id)
+    return None
+
+def archived_to_dict(serialize, appt):
+    # Archived rows are always loaded whole; a sparse request keeps its keys
+    data=appointment_to_dict(appt)
+    return data if serialize is appointment_to_dict else {name: data[name] for name, _ in serialize.fields}
+
 @api_bp.route('/appointments', methods=['GET'])
 @login_required
 def api_list_appointments():
     status_filter = request.args.get('status', '').strip()
-    if current_user.role == 'admin':
-        q=Appointment.query
-    elif current_user.role == 'doctor' and current_user.doctor:
-        q=Appointment.query.filter_by(doctor_id=current_user.doctor.id)
-    elif current_user.role == 'patient' and current_user.patient:
-        q=Appointment.query.filter_by(patient_id=current_user.patient.id)
-    else:
+    try:
+        limit, cursor=parse_page_args()
+        serialize=parse_fields(appointment_to_dict)
+    except ValueError as e:
+        return bad_request(str(e))
+    q=visible_appointments()
+    if q is None:
         return bad_request("Unsupported role for appointments listing", 403)
+    archived=visible_appointments(ArchivedAppointment)
     if status_filter:
         q=q.filter(Appointment.status==status_filter)
-    appts=q.order_by(Appointment.appt_date.desc(), Appointment.appt_time.desc()).all()
-    return jsonify([appointment_to_dict(a) for a in appts])
+        archived=archived.filter(ArchivedAppointment.status==status_filter)
+    # newest first; id breaks ties so every row has one place in the order.
+    # Paging past the last hot row carries on into the archive
+    try:
+        appts, old, next_cursor=keyset_page_with_archive(serialize.apply(q), archived, cursor, limit)
+    except ValueError as e:
+        return bad_request(str(e))
+    return page_response([serialize(a) for a in appts]+[archived_to_dict(serialize, a) for a in old], next_cursor, limit)
+
+@api_bp.route('/appointments/export', methods=['GET'])
+@login_required
+def api_export_appointments():
+    # Whole history, streamed: ?format=ndjson|csv, optional status, from and to
+    fmt=request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return bad_request(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    q=visible_appointments()
+    if q is None:
+        return bad_request("Unsupported role for appointments export", 403)
+    archived=visible_appointments(ArchivedAppointment)
+    status_filter=request.args.get('status', '').strip()
+    if status_filter:
+        q=q.filter(Appointment.status==status_filter)
+        archived=archived.filter(ArchivedAppointment.status==status_filter)
+    try:
+        start=date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end=date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return bad_request("Invalid date format, use YYYY-MM-DD")
+    if start:
+        q=q.filter(Appointment.appt_date>=start)
+        archived=archived.filter(ArchivedAppointment.appt_date>=start)
+    if end:
+        q=q.filter(Appointment.appt_date<=end)
+        archived=archived.filter(ArchivedAppointment.appt_date<=end)
+    # the archive is only read when the range reaches back into it
+    through=archived_through()
+    if through is None or (start and start>through):
+        archived=None
+    response=Response(stream_with_context(stream_export(q, fmt, archived)), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition']=f'attachment; filename=appointments.{fmt}'
+    return response
 
 @api_bp.route('/appointments', methods=['POST'])
 @login_required
@@ -154,6 +408,9 @@ def api_create_appointment():
     pat=current_user.patient
     if not pat:
         return bad_request("Patient profile not found", 400)
+
+    if held_by_other(doctor.id, appt_date, appt_time, pat.id):
+        return bad_request("The selected time slot is temporarily held by another patient", 409)
     
     appt=Appointment(
         patient_id=pat.id,
@@ -176,19 +433,39 @@ def api_create_appointment():
 @api_bp.route('/appointments/<int:appt_id>', methods=['GET'])
 @login_required
 def api_get_appointment(appt_id):
-    appt=Appointment.query.get_or_404(appt_id)
-    if current_user.role =='admin':
-        return jsonify(appointment_to_dict(appt))
-    
-    if current_user.role =='doctor' and current_user.doctor and appt.doctor_id == current_user.doctor.id:
-        return jsonify(appointment_to_dict(appt))
-    
-    if current_user.role =='patient' and current_user.patient and appt.patient_id == current_user.patient.id:
-        return jsonify(appointment_to_dict(appt))
-    
-    abort(403)
+    # Authorized and validated from the version row alone; the appointment is
+    # only loaded when the client's copy is out of date
+    version=appointment_version(appt_id)
+    if version is None:
+        return archived_appointment_response(appt_id)
+    doctor_id, patient_id, last_modified=version
+    if not (current_user.role =='admin'
+            or (current_user.role =='doctor' and current_user.doctor and doctor_id == current_user.doctor.id)
+            or (current_user.role =='patient' and current_user.patient and patient_id == current_user.patient.id)):
+        abort(403)
+    etag=entity_tag('appointment', appt_id, last_modified)
+    cached=not_modified(etag, last_modified)
+    if cached:
+        return cached
+    appt=appointment_to_dict.apply(Appointment.query.filter(Appointment.id==appt_id)).one()
+    return with_validators(jsonify(appointment_to_dict(appt)), etag, last_modified)
 
 
+def archived_appointment_response(appt_id):
+    # Archived appointments never change, so their tag never does either
+    appt=with_archived_names(ArchivedAppointment.query.filter(ArchivedAppointment.id==appt_id)).first()
+    if appt is None:
+        abort(404)
+    if not (current_user.role =='admin'
+            or (current_user.role =='doctor' and current_user.doctor and appt.doctor_id == current_user.doctor.id)
+            or (current_user.role =='patient' and current_user.patient and appt.patient_id == current_user.patient.id)):
+        abort(403)
+    etag=entity_tag('archived-appointment', appt_id)
+    cached=not_modified(etag)
+    if cached:
+        return cached
+    return with_validators(jsonify(appointment_to_dict(appt)), etag)
+
 @api_bp.route('/appointments/<int:appt_id>', methods=['PATCH'])
 @login_required
 def api_update_appointment_status(appt_id):
@@ -196,24 +473,10 @@ def api_update_appointment_status(appt_id):
     data=request.get_json(silent=True) or {}
     new_status=data.get('status')
 
-    if new_status not in {'Booked', 'Completed', 'Cancelled'}:
-        return bad_request("Invalid status")
-    
-    # Authorization check
-    if current_user.role =='admin':
-        allowed=True
-    elif current_user.role =='doctor' and current_user.doctor and appt.doctor_id == current_user.doctor.id:
-        allowed=True
-    elif current_user.role =='patient' and current_user.patient and appt.patient_id == current_user.patient.id:
-        if new_status =='Cancelled' and appt.status =='Booked':
-            allowed=True
-        else:
-            return bad_request("Patients can only cancel their booked appointments", 403)
-    else:
-        return bad_request("You are not authorized to update this appointment", 403)
-    
-    if appt.status =='Completed' and new_status =='Booked':
-        return bad_request("Cannot revert a completed appointment to booked via api, contact admin", 400)
+    # Validation and authorization, shared with the batch endpoint
+    error=status_change_error(current_user, appt, new_status)
+    if error:
+        return bad_request(*error)
     appt.status=new_status
     db.session.commit()
     return jsonify(appointment_to_dict(appt))
@@ -222,18 +485,103 @@ def api_update_appointment_status(appt_id):
 @login_required
 def api_delete_appointment(appt_id):
     appt=Appointment.query.get_or_404(appt_id)
-    
-    if current_user.role =='admin':
-        allowed=True
-    elif current_user.role =='doctor' and current_user.doctor and appt.doctor_id == current_user.doctor.id:
-        allowed=True
-    elif current_user.role =='patient' and current_user.patient and appt.patient_id == current_user.patient.id:
-        if appt.appt_date > date.today() and appt.status =='Booked':
-            allowed=True
-        else:
-            return bad_request("Patients can only cancel their upcoming booked appointments", 403)
-    else:
-        return bad_request("You are not authorized to delete this appointment", 403)
+    error=delete_error(current_user, appt)
+    if error:
+        return bad_request(*error)
     db.session.delete(appt)
     db.session.commit()
-    return jsonify({"deleted": True,"id": appt_id})
\ No newline at end of file
+    return jsonify({"deleted": True,"id": appt_id})
+
+@api_bp.route('/appointments/batch', methods=['POST'])
+@login_required
+def api_batch_appointments():
+    # {"operations": [{"op": "create", "doctor_id", "date", "time"},
+    #                 {"op": "status", "id", "status"}, {"op": "delete", "id"}, ...]}
+    data=request.get_json(silent=True) or {}
+    try:
+        results=run_batch(current_user, data.get('operations'))
+    except BatchError as e:
+        return bad_request(str(e), e.status_code)
+    return jsonify({
+        "applied": sum(1 for r in results if 'error' not in r),
+        "results": results,
+    })
+
+#------Dashboard API--------
+
+def status_counts_to_dict(counts):
+    return {status: counts.get(status, 0) for status in STATUSES}
+
+@api_bp.route('/dashboard', methods=['GET'])
+@login_required
+def api_dashboard():
+    # Everything the current role's dashboard shows, in one payload
+    if current_user.role == 'patient' and current_user.patient:
+        data=patient_dashboard(current_user.patient)
+        return jsonify({
+            "role": "patient",
+            "upcoming": [appointment_to_dict(a) for a in data.upcoming],
+            "past": [appointment_to_dict(a) for a in data.past],
+            "departments": [{"id": d.id, "name": d.name, "description": d.description} for d in data.departments],
+            "doctors": [{"id": d.id, "name": d.name, "specialization": d.specialization,
+                         "department_id": d.department_id, "department": d.department_name} for d in data.doctors],
+            "availability": {
+                "days": [d.isoformat() for d in data.days],
+                "doctors": [{"doctor_id": d.id, "free": data.availability[d.id]} for d in data.doctors],
+            },
+            "status_counts": [{"doctor_id": doctor_id, "doctor_name": name, **status_counts_to_dict(counts)}
+                              for (doctor_id, name), counts in sorted(data.status_counts.items(), key=lambda kv: kv[0][1])],
+        })
+    if current_user.role == 'doctor' and current_user.doctor:
+        data=doctor_dashboard(current_user.doctor)
+        return jsonify({
+            "role": "doctor",
+            "today": [appointment_to_dict(a) for a in data.today],
+            "week": [appointment_to_dict(a) for a in data.week],
+            "patients": [patient_to_dict(p) for p in data.patients],
+            "status_counts": status_counts_to_dict(data.status_totals),
+        })
+    if current_user.role == 'admin':
+        counters=admin_dashboard().counters
+        return jsonify({
+            "role": "admin",
+            "totals": {"doctors": counters.doctors, "patients": counters.patients, "appointments": counters.appointments},
+            "status_counts": {status: getattr(counters, column) for status, column in STATS_COLUMNS.items()},
+        })
+    return bad_request("Unsupported role for dashboard", 403)
+
+#------Appointment analytics API--------
+
+MAX_SERIES_MONTHS = 24
+
+@api_bp.route('/stats/appointments/daily', methods=['GET'])
+@login_required
+def api_appointments_per_day():
+    # Reads the daily rollups only; doctors see their own appointments
+    if current_user.role not in ('admin', 'doctor') or (current_user.role == 'doctor' and not current_user.doctor):
+        return bad_request("Only admins and doctors can read appointment statistics", 403)
+    group=request.args.get('group', 'department')
+    if group not in ROLLUP_GROUPS:
+        return bad_request(f"group must be one of: {', '.join(ROLLUP_GROUPS)}")
+    months=request.args.get('months', 3, type=int)
+    if months is None or months<1 or months>MAX_SERIES_MONTHS:
+        return bad_request(f"months must be between 1 and {MAX_SERIES_MONTHS}")
+    # the current month so far plus the `months`-1 whole months before it
+    end=date.today()
+    first=end.year*12+end.month-1-(months-1)
+    start=date(first//12, first%12+1, 1)
+    doctor_id=request.args.get('doctor_id', type=int)
+    if current_user.role == 'doctor':
+        doctor_id=current_user.doctor.id
+    series=daily_series(start, end, group=group, doctor_id=doctor_id,
+                        department_id=request.args.get('department_id', type=int),
+                        status=request.args.get('status') or None)
+    return jsonify({"from": start.isoformat(), "to": end.isoformat(), "group": group, "series": series})
+
+#------Cache stats API--------
+
+@api_bp.route('/cache/stats', methods=['GET'])
+@login_required
+@role_required("admin")
+def api_cache_stats():
+    return jsonify(cache_stats())
\ No newline at end of file
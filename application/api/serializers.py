@@ -0,0 +1,216 @@
+from sqlalchemy.orm import joinedload, selectinload, aliased
+from sqlalchemy.orm.interfaces import MANYTOONE
+from application.models import Doctor, Patient, Appointment, Treatment, User, Department
+
+# --------------------------------------------------------
+# ------- API serializers -------
+# --------------------------------------------------------
+# Every serializer declares the relationships it reads ("doctor.user") next to
+# the code that reads them. Query builders call `.apply(query)` to load all of
+# them up front, so a list costs the same handful of queries at any page size:
+# many-to-one hops are joined into the main SELECT, anything else (the
+# appointment's treatment) is fetched in one extra IN query per hop.
+#
+# Clients that want a few keys (?fields=id,date,status) get a Projection
+# instead: the query is narrowed to just the columns those keys need, plus
+# outer joins over private aliases, and rows are rendered without ever
+# building ORM objects.
+
+
+class Serializer:
+    def __init__(self, model, func, loads=(), fields=None):
+        self.model = model
+        self.func = func
+        self.loads = tuple(loads)
+        self.fields = fields or {}
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __call__(self, obj):
+        return self.func(obj)
+
+    def options(self):
+        """Loader options covering every declared relationship path."""
+        options = []
+        for path in self.loads:
+            model, option = self.model, None
+            for name in path.split('.'):
+                attr = getattr(model, name)
+                prop = attr.property
+                joined = prop.direction is MANYTOONE
+                if option is None:
+                    option = joinedload(attr) if joined else selectinload(attr)
+                else:
+                    option = option.joinedload(attr) if joined else option.selectinload(attr)
+                model = prop.mapper.class_
+            options.append(option)
+        return options
+
+    def apply(self, query):
+        return query.options(*self.options())
+
+    def sparse(self, names):
+        """A Projection onto ``names``; ValueError naming any key this serializer lacks."""
+        unknown = [n for n in names if n not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return Projection(self.model, [(n, f) for n, f in self.fields.items() if n in names])
+
+
+class Field:
+    """One output key: the columns it reads, how they render, and the outer
+    joins (target, onclause) the columns need."""
+    def __init__(self, *columns, render=None, joins=()):
+        self.columns = columns
+        self.render = render or (lambda value: value)
+        self.joins = joins
+
+
+class Projection:
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+
+    def apply(self, query):
+        # rows lead with the primary key, so the model stays the left side of
+        # the joins even when none of its own columns are asked for
+        columns, joins = list(self.model.__mapper__.primary_key), {}
+        for _, field in self.fields:
+            columns.extend(field.columns)
+            for target, onclause in field.joins:
+                joins.setdefault(target, onclause)
+        query = query.with_entities(*columns)
+        for target, onclause in joins.items():
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def __call__(self, row):
+        out, i = {}, len(self.model.__mapper__.primary_key)
+        for name, field in self.fields:
+            n = len(field.columns)
+            out[name] = field.render(*row[i:i + n])
+            i += n
+        return out
+
+
+def serializer(model, *loads, fields=None):
+    """Decorator: ``@serializer(Appointment, 'doctor.user', 'treatment', fields={...})``."""
+    def wrap(func):
+        return Serializer(model, func, loads, fields)
+    return wrap
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _hhmm(value):
+    return value.strftime("%H:%M") if value else None
+
+def _treatment(id, diagnosis, prescription, notes):
+    if id is None:
+        return None
+    return {"id": id, "diagnosis": diagnosis, "prescription": prescription, "notes": notes}
+
+
+# aliases used only by projections, so they never collide with a query's own joins
+_DoctorUser = aliased(User, name='sparse_doctor_user')
+_PatientUser = aliased(User, name='sparse_patient_user')
+_DoctorDepartment = aliased(Department, name='sparse_department')
+_ApptDoctor = aliased(Doctor, name='sparse_doctor')
+_ApptPatient = aliased(Patient, name='sparse_patient')
+_ApptDoctorUser = aliased(User, name='sparse_appt_doctor_user')
+_ApptPatientUser = aliased(User, name='sparse_appt_patient_user')
+_ApptTreatment = aliased(Treatment, name='sparse_treatment')
+
+_doctor_user = ((_DoctorUser, Doctor.user_id == _DoctorUser.id),)
+_patient_user = ((_PatientUser, Patient.user_id == _PatientUser.id),)
+
+DOCTOR_FIELDS = {
+    'id': Field(Doctor.id),
+    'name': Field(_DoctorUser.name, joins=_doctor_user),
+    'email': Field(_DoctorUser.email, joins=_doctor_user),
+    'specialization': Field(Doctor.specialization),
+    'department': Field(_DoctorDepartment.name, joins=((_DoctorDepartment, Doctor.department_id == _DoctorDepartment.id),)),
+    'is_blacklisted': Field(Doctor.is_blacklisted, render=bool),
+}
+
+PATIENT_FIELDS = {
+    'id': Field(Patient.id),
+    'name': Field(_PatientUser.name, joins=_patient_user),
+    'email': Field(_PatientUser.email, joins=_patient_user),
+    'phone': Field(Patient.phone),
+    'address': Field(Patient.address),
+    'age': Field(Patient.age),
+    'gender': Field(Patient.gender),
+    'is_blacklisted': Field(Patient.is_blacklisted, render=bool),
+}
+
+APPOINTMENT_FIELDS = {
+    'id': Field(Appointment.id),
+    'date': Field(Appointment.appt_date, render=_iso),
+    'time': Field(Appointment.appt_time, render=_hhmm),
+    'status': Field(Appointment.status),
+    'note': Field(Appointment.notes),
+    'doctor_id': Field(Appointment.doctor_id),
+    'doctor_name': Field(_ApptDoctorUser.name, joins=(
+        (_ApptDoctor, Appointment.doctor_id == _ApptDoctor.id),
+        (_ApptDoctorUser, _ApptDoctor.user_id == _ApptDoctorUser.id))),
+    'patient_id': Field(Appointment.patient_id),
+    'patient_name': Field(_ApptPatientUser.name, joins=(
+        (_ApptPatient, Appointment.patient_id == _ApptPatient.id),
+        (_ApptPatientUser, _ApptPatient.user_id == _ApptPatientUser.id))),
+    'treatment': Field(_ApptTreatment.id, _ApptTreatment.diagnosis, _ApptTreatment.prescription, _ApptTreatment.notes,
+                       render=_treatment,
+                       joins=((_ApptTreatment, _ApptTreatment.appointment_id == Appointment.id),)),
+}
+
+
+@serializer(Doctor, 'user', 'department', fields=DOCTOR_FIELDS)
+def doctor_to_dict(doctor):
+    return {
+        'id': doctor.id,
+        'name': doctor.user.name if doctor.user else None,
+        'email': doctor.user.email if doctor.user else None,
+        'specialization': doctor.specialization,
+        'department': doctor.department.name if doctor.department else None,
+        'is_blacklisted': bool(doctor.is_blacklisted),
+    }
+
+@serializer(Patient, 'user', fields=PATIENT_FIELDS)
+def patient_to_dict(patient):
+    return {
+        'id': patient.id,
+        'name': patient.user.name if patient.user else None,
+        'email': patient.user.email if patient.user else None,
+        'phone': patient.phone,
+        'address': patient.address,
+        'age': patient.age,
+        'gender': patient.gender,
+        'is_blacklisted': bool(patient.is_blacklisted),
+    }
+
+@serializer(Treatment)
+def treatment_to_dict(t: Treatment | None):
+    if not t:
+        return None
+    return {
+        "id": t.id,
+        "diagnosis": t.diagnosis,
+        "prescription": t.prescription,
+        "notes": t.notes,
+    }
+
+@serializer(Appointment, 'doctor.user', 'patient.user', 'treatment', fields=APPOINTMENT_FIELDS)
+def appointment_to_dict(a: Appointment):
+    return {
+            "id": a.id,
+            "date": a.appt_date.isoformat() if a.appt_date else None,
+            "time": a.appt_time.strftime("%H:%M") if a.appt_time else None,
+            "status": a.status,
+            "note": a.notes,
+            "doctor_id": a.doctor_id,
+            "doctor_name": a.doctor.user.name if a.doctor and a.doctor.user else None,
+            "patient_id": a.patient_id,
+            "patient_name": a.patient.user.name if a.patient and a.patient.user else None,
+            "treatment": treatment_to_dict(a.treatment),
+        }
@@ -0,0 +1,253 @@
+from collections import defaultdict
+from itertools import chain
+from types import SimpleNamespace
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from application.models import db, Appointment, Doctor, Treatment, Slot
+from application.inventory import sync_slots
+from application.availability import invalidate_summary
+from application.stats import adjust, status_deltas
+from application import rollups
+
+# --------------------------------------------------------
+# ------- Batch appointment changes -------
+# --------------------------------------------------------
+# Front-desk tools send a list of create / status / delete operations. Each one
+# is checked against the same rules as the single-item API handlers, in the
+# order given and against the state the earlier operations leave behind; the
+# accepted ones are then written together in one transaction: one DELETE per
+# table, one UPDATE per target status and one multi-row INSERT. Those bulk
+# statements skip the ORM flush, so the slot inventory, the summary cache and
+# the dashboard counters and the daily rollups are updated explicitly.
+
+DEFAULT_MAX_OPERATIONS = 200
+
+STATUSES = {'Booked', 'Completed', 'Cancelled'}
+
+
+class BatchError(Exception):
+    """The batch as a whole was refused (nothing was written)."""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _max_operations():
+    return current_app.config.get('APPOINTMENT_BATCH_MAX_OPERATIONS', DEFAULT_MAX_OPERATIONS)
+
+
+def status_change_error(user, appt, new_status):
+    """(message, status code) if `user` may not set `appt` to new_status, else None.
+    `appt` needs doctor_id, patient_id and status."""
+    if new_status not in STATUSES:
+        return "Invalid status", 400
+    if user.role == 'admin':
+        pass
+    elif user.role == 'doctor' and user.doctor and appt.doctor_id == user.doctor.id:
+        pass
+    elif user.role == 'patient' and user.patient and appt.patient_id == user.patient.id:
+        if not (new_status == 'Cancelled' and appt.status == 'Booked'):
+            return "Patients can only cancel their booked appointments", 403
+    else:
+        return "You are not authorized to update this appointment", 403
+    if appt.status == 'Completed' and new_status == 'Booked':
+        return "Cannot revert a completed appointment to booked via api, contact admin", 400
+    return None
+
+
+def delete_error(user, appt):
+    """(message, status code) if `user` may not delete `appt`, else None.
+    `appt` needs doctor_id, patient_id, appt_date and status."""
+    if user.role == 'admin':
+        return None
+    if user.role == 'doctor' and user.doctor and appt.doctor_id == user.doctor.id:
+        return None
+    if user.role == 'patient' and user.patient and appt.patient_id == user.patient.id:
+        if appt.appt_date > date.today() and appt.status == 'Booked':
+            return None
+        return "Patients can only cancel their upcoming booked appointments", 403
+    return "You are not authorized to delete this appointment", 403
+
+
+def _parse_create(op):
+    # (doctor_id, date, time) or raise ValueError with the single handler's message
+    doctor_id, date_str, time_str = op.get('doctor_id'), op.get('date'), op.get('time')
+    if not doctor_id or not date_str or not time_str:
+        raise ValueError("doctor_id, date, and time are required")
+    try:
+        return int(doctor_id), date.fromisoformat(date_str), datetime.strptime(time_str, "%H:%M").time()
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date or time format")
+
+
+class _Plan:
+    def __init__(self):
+        self.results = []
+        self.creates = []            # (result index, row)
+        self.statuses = {}           # appointment id -> final status
+        self.deletes = set()
+        self.original = {}           # appointment id -> (date, doctor_id, status) before the batch
+        self.keys = set()            # (doctor_id, date) pairs whose slots change
+
+    def ok(self, op, code, **extra):
+        self.results.append(dict(index=len(self.results), op=op, code=code, **extra))
+
+    def fail(self, op, message, code, **extra):
+        self.results.append(dict(index=len(self.results), op=op, code=code, error=message, **extra))
+
+
+def plan_batch(user, operations):
+    """Check every operation in order. Returns a _Plan of the accepted writes
+    and one result per operation."""
+    plan = _Plan()
+    ids = {op.get('id') for op in operations if op.get('op') in ('status', 'delete')}
+    ids = {i for i in ids if isinstance(i, int)}
+    current = {}
+    if ids:
+        for row in db.session.execute(
+                select(Appointment.id, Appointment.doctor_id, Appointment.patient_id,
+                       Appointment.appt_date, Appointment.appt_time, Appointment.status)
+                .where(Appointment.id.in_(ids))):
+            current[row.id] = dict(row._mapping)
+            plan.original[row.id] = (row.appt_date, row.doctor_id, row.status)
+
+    parsed = {}
+    for i, op in enumerate(operations):
+        if op.get('op') == 'create':
+            try:
+                parsed[i] = _parse_create(op)
+            except ValueError as e:
+                parsed[i] = e
+    wanted = [p for p in parsed.values() if not isinstance(p, ValueError)]
+    doctors, taken, held = {}, set(), {}
+    if wanted:
+        doctor_ids = {p[0] for p in wanted}
+        days = {p[1] for p in wanted}
+        doctors = dict(db.session.execute(
+            select(Doctor.id, Doctor.is_blacklisted).where(Doctor.id.in_(doctor_ids))).all())
+        # every stored row keeps its (doctor, date, time), whatever its status
+        taken = set(db.session.execute(
+            select(Appointment.doctor_id, Appointment.appt_date, Appointment.appt_time)
+            .where(Appointment.doctor_id.in_(doctor_ids), Appointment.appt_date.in_(days))).all())
+        held = {(r.doctor_id, r.slot_date, r.slot_time): r for r in db.session.execute(
+            select(Slot.doctor_id, Slot.slot_date, Slot.slot_time, Slot.held_by, Slot.held_until)
+            .where(Slot.state == 'held', Slot.doctor_id.in_(doctor_ids), Slot.slot_date.in_(days)))}
+
+    now = datetime.utcnow()
+    today = date.today()
+    for i, op in enumerate(operations):
+        kind = op.get('op')
+        if kind == 'create':
+            _plan_create(plan, user, op, parsed[i], doctors, taken, held, now, today)
+        elif kind in ('status', 'delete'):
+            appt_id = op.get('id')
+            appt = current.get(appt_id) if isinstance(appt_id, int) else None
+            if appt is None:
+                plan.fail(kind, "Appointment not found", 404, id=appt_id)
+                continue
+            row = SimpleNamespace(**appt)
+            if kind == 'status':
+                error = status_change_error(user, row, op.get('status'))
+                if error:
+                    plan.fail(kind, *error, id=appt_id)
+                    continue
+                appt['status'] = op['status']
+                plan.statuses[appt_id] = op['status']
+                plan.keys.add((appt['doctor_id'], appt['appt_date']))
+                plan.ok(kind, 200, id=appt_id)
+            else:
+                error = delete_error(user, row)
+                if error:
+                    plan.fail(kind, *error, id=appt_id)
+                    continue
+                del current[appt_id]
+                plan.statuses.pop(appt_id, None)
+                plan.deletes.add(appt_id)
+                taken.discard((appt['doctor_id'], appt['appt_date'], appt['appt_time']))
+                plan.keys.add((appt['doctor_id'], appt['appt_date']))
+                plan.ok(kind, 200, id=appt_id)
+        else:
+            plan.fail(kind, "op must be one of: create, status, delete", 400)
+    return plan
+
+
+def _plan_create(plan, user, op, parsed, doctors, taken, held, now, today):
+    if user.role != 'patient':
+        plan.fail('create', "Only patients can book appointments", 403)
+        return
+    if isinstance(parsed, ValueError):
+        plan.fail('create', str(parsed), 400)
+        return
+    doctor_id, appt_date, appt_time = parsed
+    if doctor_id not in doctors or doctors[doctor_id]:
+        plan.fail('create', "Doctor not available", 400)
+        return
+    if appt_date <= today:
+        plan.fail('create', "Appointment date must be in the future", 400)
+        return
+    patient = user.patient
+    if not patient:
+        plan.fail('create', "Patient profile not found", 400)
+        return
+    hold = held.get((doctor_id, appt_date, appt_time))
+    if hold and hold.held_by != patient.id and hold.held_until >= now:
+        plan.fail('create', "The selected time slot is temporarily held by another patient", 409)
+        return
+    if (doctor_id, appt_date, appt_time) in taken:
+        plan.fail('create', "The selected time slot is not available", 400)
+        return
+    taken.add((doctor_id, appt_date, appt_time))
+    plan.keys.add((doctor_id, appt_date))
+    plan.creates.append((len(plan.results), {
+        'patient_id': patient.id, 'doctor_id': doctor_id,
+        'appt_date': appt_date, 'appt_time': appt_time, 'status': 'Booked',
+    }))
+    plan.ok('create', 201)
+
+
+def run_batch(user, operations):
+    """Check and apply `operations` (dicts with op = create | status | delete) as
+    `user`. Returns one result per operation, in order; raises BatchError when
+    the batch itself is unusable or collides with a concurrent booking."""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("operations must be a non-empty list")
+    if len(operations) > _max_operations():
+        raise BatchError(f"At most {_max_operations()} operations per batch", 413)
+    if not all(isinstance(op, dict) for op in operations):
+        raise BatchError("Each operation must be an object")
+
+    plan = plan_batch(user, operations)
+    if not (plan.creates or plan.statuses or plan.deletes):
+        return plan.results
+    conn = db.session.connection()
+    try:
+        if plan.deletes:
+            # treatments first: SQLite does not enforce the ON DELETE CASCADE here
+            conn.execute(delete(Treatment).where(Treatment.appointment_id.in_(plan.deletes)))
+            conn.execute(delete(Appointment).where(Appointment.id.in_(plan.deletes)))
+        by_status = defaultdict(list)
+        for appt_id, status in plan.statuses.items():
+            by_status[status].append(appt_id)
+        now = datetime.utcnow()
+        for status, ids in by_status.items():
+            conn.execute(update(Appointment).where(Appointment.id.in_(ids)).values(status=status, updated_at=now))
+        if plan.creates:
+            new_ids = conn.execute(
+                insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+                [row for _, row in plan.creates]).scalars().all()
+            for (index, _), new_id in zip(plan.creates, new_ids):
+                plan.results[index]['id'] = new_id
+        sync_slots(conn, plan.keys)
+        removed = [plan.original[i] for i in chain(plan.deletes, plan.statuses)]
+        added = [*((*plan.original[i][:2], status) for i, status in plan.statuses.items()),
+                 *((row['appt_date'], row['doctor_id'], 'Booked') for _, row in plan.creates)]
+        adjust(conn, status_deltas(removed=[k[2] for k in removed], added=[k[2] for k in added]))
+        rollups.adjust(conn, rollups.key_deltas(removed=removed, added=added))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise BatchError("A slot was booked concurrently; nothing was changed, please retry", 409)
+    invalidate_summary(plan.keys)
+    return plan.results
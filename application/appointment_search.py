@@ -0,0 +1,85 @@
+import time as _time
+from flask import current_app
+from sqlalchemy import or_, cast, String, func
+from sqlalchemy.orm import aliased, contains_eager
+from application.models import db, Appointment, Doctor, Patient, User, Treatment
+from application.cache import LRUCache
+from application.pagination import keyset_page, encode_cursor
+
+# --------------------------------------------------------
+# ------- Admin appointment search -------
+# --------------------------------------------------------
+# The filter (doctor name, patient name, status or date containing q) runs in
+# SQL over explicit joins that also fill the relationships the list renders.
+# Pages are keyset pages over (appt_date, appt_time, id), newest first, so a
+# deep page costs the same as the first (cursors are application/pagination.py
+# cursors over that key). The total is only an estimate: it is
+# cached per search for APPOINTMENT_COUNT_TTL_SECONDS rather than recounted.
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_COUNT_TTL_SECONDS = 60
+
+count_cache = LRUCache('appointment_search_count', maxsize=256)
+
+_DoctorUser = aliased(User, name='doctor_user')
+_PatientUser = aliased(User, name='patient_user')
+
+
+ORDER_KEY = (Appointment.appt_date, Appointment.appt_time, Appointment.id)
+
+
+def _cursor(appt):
+    return encode_cursor((appt.appt_date, appt.appt_time, appt.id))
+
+
+def _filtered(q):
+    query = (db.session.query(Appointment)
+             .join(Patient, Appointment.patient_id == Patient.id)
+             .join(_PatientUser, Patient.user_id == _PatientUser.id)
+             .outerjoin(Doctor, Appointment.doctor_id == Doctor.id)
+             .outerjoin(_DoctorUser, Doctor.user_id == _DoctorUser.id))
+    if q:
+        like = f'%{q}%'
+        query = query.filter(or_(_DoctorUser.name.ilike(like),
+                                 _PatientUser.name.ilike(like),
+                                 Appointment.status.ilike(like),
+                                 cast(Appointment.appt_date, String).like(like)))
+    return query
+
+
+def search_appointments(q='', after=None, before=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of appointments matching q, newest first. ``after``/``before`` are
+    cursors from a previous page. Returns (appointments, next_cursor, prev_cursor)."""
+    query = (_filtered(q)
+             .outerjoin(Treatment, Treatment.appointment_id == Appointment.id)
+             .options(contains_eager(Appointment.patient).contains_eager(Patient.user.of_type(_PatientUser)),
+                      contains_eager(Appointment.doctor).contains_eager(Doctor.user.of_type(_DoctorUser)),
+                      contains_eager(Appointment.treatment)))
+    if before:
+        # walk back towards newer rows, then flip the page into display order
+        rows, newer = keyset_page(query, ORDER_KEY, before, limit)
+        rows = rows[::-1]
+        return rows, (_cursor(rows[-1]) if rows else None), newer
+    rows, next_cursor = keyset_page(query, ORDER_KEY, after, limit, descending=True)
+    prev_cursor = _cursor(rows[0]) if rows and after else None
+    return rows, next_cursor, prev_cursor
+
+
+def approximate_count(q=''):
+    """Number of appointments matching q, at most APPOINTMENT_COUNT_TTL_SECONDS old."""
+    ttl = current_app.config.get('APPOINTMENT_COUNT_TTL_SECONDS', DEFAULT_COUNT_TTL_SECONDS)
+    key = q.lower()
+    cached = count_cache.get(key)
+    now = _time.monotonic()
+    if cached is not None and now - cached[1] < ttl:
+        return cached[0]
+    count = _filtered(q).with_entities(func.count(Appointment.id)).scalar()
+    count_cache.set(key, (count, now))
+    return count
+
+
+def init_app(app):
+    # create_all() does not add indexes to tables that already exist
+    with app.app_context():
+        for index in Appointment.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
@@ -0,0 +1,158 @@
+from datetime import datetime, date, time, timedelta
+from flask import current_app
+from sqlalchemy import MetaData, select, insert, delete, literal, func, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.orm import joinedload, selectinload
+from application.models import db, Doctor, Patient, Appointment, Treatment, ArchivedAppointment, ArchivedTreatment
+from application.pagination import keyset_page, encode_cursor, DEFAULT_PAGE_SIZE
+
+# --------------------------------------------------------
+# ------- Appointment archive -------
+# --------------------------------------------------------
+# Appointments dated more than ARCHIVE_HORIZON_DAYS ago, whatever their status,
+# are moved with their treatments into archived_appointments / archived_treatments
+# (`flask archive-appointments`, e.g. nightly from cron), so the hot tables and
+# their indexes only hold recent and future rows. New and rescheduled bookings
+# are always in the future, so every archived row is older than every hot one:
+# reads that walk history newest first only open the archive once the hot rows
+# run out. Dashboards, slots and search never read it.
+#
+# Moves are bulk statements that skip the ORM flush on purpose: the dashboard
+# counters and daily rollups keep counting archived appointments, and their
+# rebuilds read both tables.
+#
+# Archived rows keep their ids, so the hot tables are AUTOINCREMENT tables:
+# SQLite would otherwise hand the ids of archived rows to new bookings.
+# init_app() rebuilds tables created before that, once.
+
+DEFAULT_HORIZON_DAYS = 730
+DEFAULT_BATCH_SIZE = 1000
+
+_APPOINTMENT_COLUMNS = ('id', 'patient_id', 'doctor_id', 'appt_date', 'appt_time', 'status', 'notes',
+                        'created_at', 'updated_at')
+_TREATMENT_COLUMNS = ('id', 'appointment_id', 'diagnosis', 'prescription', 'notes')
+
+HOT_KEY = (Appointment.appt_date, Appointment.appt_time, Appointment.id)
+ARCHIVE_KEY = (ArchivedAppointment.appt_date, ArchivedAppointment.appt_time, ArchivedAppointment.id)
+
+
+def horizon_cutoff():
+    """Appointments dated before this day belong in the archive."""
+    return date.today() - timedelta(days=current_app.config.get('ARCHIVE_HORIZON_DAYS', DEFAULT_HORIZON_DAYS))
+
+
+def archive_appointments(before=None):
+    """Move appointments dated before ``before`` (default: the horizon) and their
+    treatments into the archive, one committed batch at a time. Returns the count."""
+    before = before or horizon_cutoff()
+    size = current_app.config.get('ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    moved = 0
+    while True:
+        ids = db.session.execute(select(Appointment.id).where(Appointment.appt_date < before)
+                                 .order_by(Appointment.id).limit(size)).scalars().all()
+        if not ids:
+            return moved
+        conn = db.session.connection()
+        conn.execute(insert(ArchivedAppointment).from_select(
+            [*_APPOINTMENT_COLUMNS, 'archived_at'],
+            select(*(getattr(Appointment, c) for c in _APPOINTMENT_COLUMNS), literal(datetime.utcnow()))
+            .where(Appointment.id.in_(ids))))
+        conn.execute(insert(ArchivedTreatment).from_select(
+            list(_TREATMENT_COLUMNS),
+            select(*(getattr(Treatment, c) for c in _TREATMENT_COLUMNS)).where(Treatment.appointment_id.in_(ids))))
+        # treatments first: SQLite does not enforce the ON DELETE CASCADE here
+        conn.execute(delete(Treatment).where(Treatment.appointment_id.in_(ids)))
+        conn.execute(delete(Appointment).where(Appointment.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+
+def archived_through():
+    """Date of the newest archived appointment, None while the archive is empty."""
+    return db.session.execute(select(func.max(ArchivedAppointment.appt_date))).scalar()
+
+
+def has_archived(**filters):
+    return db.session.query(ArchivedAppointment.query.filter_by(**filters).exists()).scalar()
+
+
+def with_names(query):
+    # what the history pages and appointment_to_dict read
+    return query.options(joinedload(ArchivedAppointment.doctor).joinedload(Doctor.user),
+                         joinedload(ArchivedAppointment.patient).joinedload(Patient.user),
+                         selectinload(ArchivedAppointment.treatment))
+
+
+def archived_history(**filters):
+    """Archived appointments matching ``filters``, newest first, ready to render."""
+    return (with_names(ArchivedAppointment.query.filter_by(**filters))
+            .order_by(ArchivedAppointment.appt_date.desc(), ArchivedAppointment.appt_time.desc()).all())
+
+
+def keyset_page_with_archive(query, archived_query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """keyset_page over ``query`` newest first by (date, time, id), continued into
+    ``archived_query`` (same filters, no loader options) once the hot rows run out.
+    Returns (rows, archived_rows, next_cursor); archived rows come with names loaded."""
+    rows, next_cursor = keyset_page(query, HOT_KEY, cursor, limit, descending=True)
+    if next_cursor is not None:
+        return rows, [], next_cursor
+    if len(rows) == limit:
+        # the next page starts at the newest matching archived row, if any
+        newest = archived_query.with_entities(func.max(ArchivedAppointment.appt_date)).scalar()
+        if newest is None:
+            return rows, [], None
+        return rows, [], encode_cursor((newest + timedelta(days=1), time.min, 0))
+    archived, next_cursor = keyset_page(with_names(archived_query), ARCHIVE_KEY, cursor, limit - len(rows), descending=True)
+    return rows, archived, next_cursor
+
+
+def _has_autoincrement(conn, table):
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {'name': table.name}).scalar()
+    return sql is None or 'AUTOINCREMENT' in sql.upper()
+
+
+def _rebuild_with_autoincrement(conn, table, archived):
+    # SQLite cannot alter a primary key: copy the rows into a new table, swap it
+    # in and bring the indexes back
+    metadata = MetaData()
+    for fk in table.foreign_keys:
+        # the copy's foreign keys need their targets to compile
+        fk.column.table.to_metadata(metadata)
+    staging = table.to_metadata(metadata, name=f"{table.name}_rebuild")
+    columns = ', '.join(c.name for c in table.columns)
+    conn.execute(text(f"DROP TABLE IF EXISTS {staging.name}"))
+    conn.execute(CreateTable(staging))
+    conn.execute(text(f"INSERT INTO {staging.name} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {staging.name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(conn)
+    # continue after the highest id ever used, archived ones included
+    top = conn.execute(select(func.max(archived.c.id))).scalar() or 0
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {'name': table.name})
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) "
+                      f"SELECT :name, max(coalesce(max(id), 0), :top) FROM {table.name}"),
+                 {'name': table.name, 'top': top})
+
+
+def init_app(app):
+    with app.app_context():
+        pending = [(m.__table__, a.__table__) for m, a in
+                   ((Appointment, ArchivedAppointment), (Treatment, ArchivedTreatment))
+                   if not _has_autoincrement(db.session.connection(), m.__table__)]
+        db.session.commit()
+        if not pending:
+            return
+        with db.engine.connect() as conn:
+            # dropping the old table must not cascade into its children
+            enforced = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            conn.commit()
+            try:
+                with conn.begin():
+                    for table, archived in pending:
+                        _rebuild_with_autoincrement(conn, table, archived)
+            finally:
+                conn.exec_driver_sql(f"PRAGMA foreign_keys = {'ON' if enforced else 'OFF'}")
+                conn.commit()
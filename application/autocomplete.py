@@ -0,0 +1,209 @@
+import heapq
+import threading
+import time as _time
+from collections import Counter
+from flask import current_app
+from application.models import db, Doctor, User, Department
+from application.coherence import track, current_generation
+
+# --------------------------------------------------------
+# ------- Doctor search autocomplete -------
+# --------------------------------------------------------
+# An in-process prefix trie over active doctor names, their specializations and
+# departments. Every node keeps its best k completions, so a lookup is one walk
+# down the typed prefix. Each word of a term is indexed ("cha" finds "Jananiia
+# Chawla"). The trie is built on first use and patched in place by the admin
+# doctor routes; writes from other workers (or any other doctor/department
+# change) clear it through the coherence generation and it is rebuilt lazily.
+
+TOP_K = 10
+DEFAULT_MAX_AGE_SECONDS = 300
+
+# ties on weight: doctors first, then specializations, then departments
+_KIND_ORDER = {'doctor': 0, 'specialization': 1, 'department': 2}
+
+
+class _Node:
+    __slots__ = ('children', 'terminal', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = set()
+        self.top = []
+
+
+def _index_terms(text):
+    # "Jananiia  Chawla" -> ["jananiia chawla", "chawla"]
+    words = text.lower().split()
+    return list(dict.fromkeys(' '.join(words[i:]) for i in range(len(words))))
+
+
+class PrefixTrie:
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self._root = _Node()
+        self._entries = {}  # key -> (rank, value, terms)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _rank(self, key):
+        return self._entries[key][0]
+
+    def _refresh(self, path):
+        # Recompute the cached top-k bottom-up along a root..leaf path, pruning empty nodes
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            candidates = set(node.terminal)
+            for child in node.children.values():
+                candidates.update(child.top)
+            node.top = heapq.nsmallest(self.k, candidates, key=self._rank)
+            if depth and not node.children and not node.terminal:
+                parent = path[depth - 1]
+                parent.children = {c: n for c, n in parent.children.items() if n is not node}
+
+    def _path(self, term, create):
+        node = self._root
+        path = [node]
+        for ch in term:
+            child = node.children.get(ch)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[ch] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def put(self, key, text, weight, value):
+        """Insert or re-rank ``key``; ``text`` is what prefixes are matched against."""
+        self.remove(key)
+        terms = _index_terms(text)
+        self._entries[key] = ((-weight, _KIND_ORDER.get(key[0], 9), text.lower(), key), value, terms)
+        for term in terms:
+            path = self._path(term, create=True)
+            path[-1].terminal.add(key)
+            self._refresh(path)
+
+    def remove(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        for term in entry[2]:
+            path = self._path(term, create=False)
+            if path is not None:
+                path[-1].terminal.discard(key)
+                self._refresh(path)
+        del self._entries[key]
+
+    def complete(self, prefix, k=None):
+        path = self._path(' '.join(prefix.lower().split()), create=False)
+        if path is None:
+            return []
+        return [self._entries[key][1] for key in path[-1].top[:k or self.k]]
+
+
+class DoctorAutocomplete:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = None
+        self._trie = None
+        self._built_at = 0.0
+        self._doctors = {}        # doctor_id -> (specialization, department_id)
+        self._specializations = Counter()   # lowercased -> active doctor count
+        self._specialization_names = {}    # lowercased -> display spelling
+        self._departments = {}    # department_id -> [name, active doctor count]
+
+    def clear(self):
+        with self._lock:
+            self._trie = None
+            self.generation = None
+
+    def _max_age(self):
+        return current_app.config.get('AUTOCOMPLETE_MAX_AGE_SECONDS', DEFAULT_MAX_AGE_SECONDS)
+
+    def _rows(self, *conditions):
+        return (db.session.query(Doctor.id, User.name, Doctor.specialization, Department.id, Department.name)
+                .join(User, Doctor.user_id == User.id)
+                .outerjoin(Department, Doctor.department_id == Department.id)
+                .filter(Doctor.is_blacklisted == False, *conditions)
+                .all())
+
+    def _build(self):
+        # read the generation first, so a write landing mid-build still clears us
+        generation = current_generation('doctors')
+        self._trie = PrefixTrie()
+        self._doctors, self._specializations, self._specialization_names, self._departments = {}, Counter(), {}, {}
+        for doc_id, name, specialization, dept_id, dept_name in self._rows():
+            self._add(doc_id, name, specialization, dept_id, dept_name)
+        self.generation = generation
+        self._built_at = _time.monotonic()
+
+    def _add(self, doc_id, name, specialization, dept_id, dept_name):
+        specialization = (specialization or '').strip() or None
+        self._doctors[doc_id] = (specialization, dept_id)
+        self._trie.put(('doctor', doc_id), name, 1, {'text': name, 'kind': 'doctor', 'id': doc_id})
+        if specialization:
+            self._specialization_names.setdefault(specialization.lower(), specialization)
+            self._specializations[specialization.lower()] += 1
+            self._put_specialization(specialization.lower())
+        if dept_id is not None:
+            dept = self._departments.setdefault(dept_id, [dept_name, 0])
+            dept[0] = dept_name
+            dept[1] += 1
+            self._put_department(dept_id)
+
+    def _discard(self, doc_id):
+        specialization, dept_id = self._doctors.pop(doc_id)
+        self._trie.remove(('doctor', doc_id))
+        if specialization:
+            self._specializations[specialization.lower()] -= 1
+            self._put_specialization(specialization.lower())
+        if dept_id is not None:
+            self._departments[dept_id][1] -= 1
+            self._put_department(dept_id)
+
+    def _put_specialization(self, lowered):
+        key = ('specialization', lowered)
+        count = self._specializations[lowered]
+        if count > 0:
+            name = self._specialization_names[lowered]
+            self._trie.put(key, name, count, {'text': name, 'kind': 'specialization'})
+        else:
+            del self._specializations[lowered]
+            del self._specialization_names[lowered]
+            self._trie.remove(key)
+
+    def _put_department(self, dept_id):
+        name, count = self._departments[dept_id]
+        key = ('department', dept_id)
+        if count > 0:
+            self._trie.put(key, name, count, {'text': name, 'kind': 'department', 'id': dept_id})
+        else:
+            del self._departments[dept_id]
+            self._trie.remove(key)
+
+    def complete(self, prefix, k=TOP_K):
+        """Top-k completions as dicts: {'text', 'kind', 'id'} (no id for specializations)."""
+        with self._lock:
+            if self._trie is None or _time.monotonic() - self._built_at > self._max_age():
+                self._build()
+            trie = self._trie
+        return trie.complete(prefix, k)
+
+    def doctor_changed(self, doctor_id):
+        """Re-index one doctor after a committed create/edit/delete/blacklist.
+        A doctor/department write from another worker that commits in the same instant can
+        be missed; the max-age rebuild bounds how long that lasts."""
+        with self._lock:
+            if self._trie is None:
+                return
+            generation = current_generation('doctors')
+            if doctor_id in self._doctors:
+                self._discard(doctor_id)
+            for row in self._rows(Doctor.id == doctor_id):
+                self._add(*row)
+            self.generation = generation
+
+
+doctor_autocomplete = track('doctors', DoctorAutocomplete())
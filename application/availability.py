@@ -0,0 +1,184 @@
+import heapq
+from operator import itemgetter
+from itertools import islice
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, inspect, tuple_, and_, or_
+from sqlalchemy.orm import Session, object_session
+from application.models import (db, Slot, Appointment, DoctorAvailability, Doctor,
+                                AvailabilityTemplate, AvailabilityException)
+from application.schedule import SlotBitmap
+from application.inventory import ensure_materialized
+from application.cache import LRUCache
+from application.coherence import bind
+
+# --------------------------------------------------------
+# ------- Availability engine -------
+# --------------------------------------------------------
+# Answers free-slot questions for many doctors x many days with one range
+# scan over the materialized `slots` inventory (see application/inventory.py),
+# instead of two queries per (doctor, day). A hold past its expiry counts as
+# free straight away; the sweep only tidies the rows up.
+
+def window_slots(target_date, start_time, end_time):
+    # 30 minute slot start times inside one availability window
+    return SlotBitmap.from_window(start_time, end_time).times()
+
+
+def slot_is_free(now=None):
+    # Filter for slots a patient can take: free, or held past held_until
+    now = now or datetime.utcnow()
+    return and_(Slot.state.in_(('free', 'held')), or_(Slot.state == 'free', Slot.held_until < now))
+
+
+def _bookable_days(days):
+    # No same day booking
+    today = date.today()
+    return sorted({d for d in days if d > today})
+
+
+def free_slots_matrix(doctor_ids, days):
+    """Return {doctor_id: {day: [free times, sorted]}} for every doctor and day."""
+    doctor_ids = list(doctor_ids)
+    days = list(days)
+    matrix = {doc_id: {d: [] for d in days} for doc_id in doctor_ids}
+    bookable = _bookable_days(days)
+    if not doctor_ids or not bookable:
+        return matrix
+
+    ensure_materialized(doctor_ids, bookable[-1])
+    wanted = set(bookable)
+    rows = (db.session.query(Slot.doctor_id, Slot.slot_date, Slot.slot_time)
+            .filter(Slot.doctor_id.in_(doctor_ids),
+                    slot_is_free(),
+                    Slot.slot_date.between(bookable[0], bookable[-1]))
+            .order_by(Slot.doctor_id, Slot.slot_date, Slot.slot_time)
+            .all())
+    for doc_id, day, t in rows:
+        if day in wanted:
+            matrix[doc_id][day].append(t)
+    return matrix
+
+
+def availability_matrix(doctor_ids, days):
+    """Return {doctor_id: [free slot count per day]} in the order of ``days``.
+    Counts are served from summary_cache; only the missing (doctor, day) cells hit the database."""
+    doctor_ids = list(doctor_ids)
+    days = list(days)
+    bookable = set(_bookable_days(days))
+    keys = [(doc_id, d) for doc_id in doctor_ids for d in days if d in bookable]
+    counts = summary_cache.get_many(keys)
+    missing = [k for k in keys if k not in counts]
+    if missing:
+        matrix = free_slots_matrix({doc_id for doc_id, _ in missing}, {d for _, d in missing})
+        fresh = {(doc_id, d): len(matrix[doc_id][d]) for doc_id, d in missing}
+        summary_cache.set_many(fresh)
+        counts.update(fresh)
+    return {doc_id: [counts.get((doc_id, d), 0) for d in days] for doc_id in doctor_ids}
+
+
+def free_slots_for(doctor_id, target_date):
+    return free_slots_matrix([doctor_id], [target_date])[doctor_id][target_date]
+
+
+def _free_slot_stream(doctor_id, start, end, page_size):
+    # Yields (date, time, doctor_id) in time order, one small keyset page at a time
+    after = None
+    while True:
+        q = (db.session.query(Slot.slot_date, Slot.slot_time)
+             .filter(Slot.doctor_id == doctor_id, slot_is_free(),
+                     Slot.slot_date.between(start, end)))
+        if after is not None:
+            q = q.filter(tuple_(Slot.slot_date, Slot.slot_time) > after)
+        rows = q.order_by(Slot.slot_date, Slot.slot_time).limit(page_size).all()
+        for slot_date, slot_time in rows:
+            yield slot_date, slot_time, doctor_id
+        if len(rows) < page_size:
+            return
+        after = tuple(rows[-1])
+
+
+def earliest_free_slots(doctor_ids, start, end, limit):
+    """Return the ``limit`` earliest free (date, time, doctor_id) across the doctors.
+    Per-doctor streams are heap-merged, so each doctor's calendar is only read as far as needed."""
+    start = max(start, date.today() + timedelta(days=1))
+    if end < start or limit <= 0:
+        return []
+    ensure_materialized(doctor_ids, end)
+    page_size = min(limit, 16)
+    streams = [_free_slot_stream(doc_id, start, end, page_size) for doc_id in doctor_ids]
+    return list(islice(heapq.merge(*streams), limit))
+
+
+def department_doctor_ids(department_id):
+    return [r[0] for r in db.session.query(Doctor.id)
+            .filter(Doctor.department_id == department_id, Doctor.is_blacklisted == False).all()]
+
+
+# --------------------------------------------------------
+# ------- Availability summary cache -------
+# --------------------------------------------------------
+# Free-slot counts keyed by (doctor_id, date). Entries are dropped by mapper
+# events as soon as an Appointment, DoctorAvailability or AvailabilityException
+# row for that doctor and date is written (any date for an AvailabilityTemplate),
+# and once more after the commit so a reader that refilled
+# the entry from the pre-commit state between flush and commit cannot leave it stale.
+# Other workers drop the entries of doctors whose slots changed (coherence.py).
+
+summary_cache = bind('availability', LRUCache('availability_summary', maxsize=4096), key=itemgetter(0))
+
+_PENDING_INVALIDATIONS = 'availability_summary_keys'
+_PENDING_DOCTOR_INVALIDATIONS = 'availability_summary_doctors'
+
+
+_DATE_ATTRS = {Appointment: 'appt_date', DoctorAvailability: 'avail_date', AvailabilityException: 'exc_date'}
+
+
+def _summary_keys(target):
+    date_attr = _DATE_ATTRS[type(target)]
+    state = inspect(target)
+    doctors = {target.doctor_id, *state.attrs.doctor_id.history.deleted}
+    days = {getattr(target, date_attr), *state.attrs[date_attr].history.deleted}
+    return {(doc_id, d) for doc_id in doctors for d in days}
+
+
+def invalidate_summary(keys):
+    keys = set(keys)
+    summary_cache.invalidate(keys)
+    return keys
+
+
+def _invalidate_on_write(mapper, connection, target):
+    keys = invalidate_summary(_summary_keys(target))
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_INVALIDATIONS, set()).update(keys)
+
+
+def _invalidate_doctor_on_write(mapper, connection, target):
+    # Templates cover open-ended date ranges, so drop every cached day of the doctor
+    doctors = {target.doctor_id, *inspect(target).attrs.doctor_id.history.deleted}
+    summary_cache.invalidate_where(lambda key: key[0] in doctors)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_DOCTOR_INVALIDATIONS, set()).update(doctors)
+
+
+for _model in (Appointment, DoctorAvailability, AvailabilityException):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _invalidate_on_write)
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(AvailabilityTemplate, _event, _invalidate_doctor_on_write)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    summary_cache.invalidate(session.info.pop(_PENDING_INVALIDATIONS, ()))
+    doctors = session.info.pop(_PENDING_DOCTOR_INVALIDATIONS, None)
+    if doctors:
+        summary_cache.invalidate_where(lambda key: key[0] in doctors)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_pending_invalidations(session, previous_transaction):
+    session.info.pop(_PENDING_INVALIDATIONS, None)
+    session.info.pop(_PENDING_DOCTOR_INVALIDATIONS, None)
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert
+from application.models import db, DoctorAvailability
+from application.intervals import IntervalIndex
+from application.inventory import sync_slots
+from application.availability import invalidate_summary
+
+# --------------------------------------------------------
+# ------- Bulk availability entry -------
+# --------------------------------------------------------
+# Weeks of windows are checked against each other and against the stored
+# windows with one IntervalIndex built from a single range query, then the
+# accepted rows go in with one executemany. Bulk inserts skip the ORM flush,
+# so the slot inventory is synced for the touched days explicitly.
+
+DEFAULT_MAX_WINDOWS = 500
+
+
+def _max_windows():
+    return current_app.config.get('BULK_AVAILABILITY_MAX_WINDOWS', DEFAULT_MAX_WINDOWS)
+
+
+def parse_time_ranges(text):
+    # "09:00-12:00, 14:00-17:30" -> [(time(9, 0), time(12, 0)), (time(14, 0), time(17, 30))]
+    ranges = []
+    for part in text.replace(';', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start_str, _, end_str = part.partition('-')
+        ranges.append((datetime.strptime(start_str.strip(), '%H:%M').time(),
+                       datetime.strptime(end_str.strip(), '%H:%M').time()))
+    if not ranges:
+        raise ValueError("no time ranges given")
+    return ranges
+
+
+def weekly_windows(start, end, weekdays, ranges):
+    """Every (date, start_time, end_time) for the given weekdays (0 = Monday) between start and end."""
+    weekdays = set(weekdays)
+    windows = []
+    for i in range((end - start).days + 1):
+        day = start + timedelta(days=i)
+        if day.weekday() in weekdays:
+            windows.extend((day, start_time, end_time) for start_time, end_time in ranges)
+    return windows
+
+
+def plan_windows(doctor_id, windows):
+    """Split (date, start_time, end_time) windows into (accepted, rejected) where
+    rejected is a list of (window, reason). Windows are checked in the given order,
+    so the first of two overlapping submissions wins."""
+    accepted, rejected = [], []
+    if not windows:
+        return accepted, rejected
+    today = date.today()
+    days = [w[0] for w in windows]
+    stored = db.session.execute(
+        select(DoctorAvailability.avail_date, DoctorAvailability.start_time, DoctorAvailability.end_time)
+        .where(DoctorAvailability.doctor_id == doctor_id,
+               DoctorAvailability.avail_date.between(min(days), max(days))))
+    index = IntervalIndex.from_rows(stored)
+    for window in windows:
+        day, start_time, end_time = window
+        if day < today:
+            rejected.append((window, 'Date is in the past'))
+        elif end_time <= start_time:
+            rejected.append((window, 'End time must be after start time'))
+        elif index.overlaps(day, start_time, end_time):
+            rejected.append((window, 'Overlaps with an existing slot'))
+        else:
+            index.add(day, start_time, end_time)
+            accepted.append(window)
+    return accepted, rejected
+
+
+def add_windows(doctor_id, windows):
+    """Validate and insert the windows in one transaction. Returns (accepted, rejected)
+    like plan_windows(); raises ValueError if more than BULK_AVAILABILITY_MAX_WINDOWS are given."""
+    if len(windows) > _max_windows():
+        raise ValueError(f"At most {_max_windows()} windows can be added at once")
+    accepted, rejected = plan_windows(doctor_id, windows)
+    if accepted:
+        conn = db.session.connection()
+        conn.execute(insert(DoctorAvailability),
+                     [{'doctor_id': doctor_id, 'avail_date': day, 'start_time': start_time, 'end_time': end_time}
+                      for day, start_time, end_time in accepted])
+        keys = {(doctor_id, day) for day, _, _ in accepted}
+        sync_slots(conn, keys)
+        db.session.commit()
+        invalidate_summary(keys)
+    return accepted, rejected
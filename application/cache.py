@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+
+# --------------------------------------------------------
+# ------- In-process LRU caches -------
+# --------------------------------------------------------
+# A cache may carry a `tagger` (see coherence.bind): every entry is stored with
+# tagger.tag() and a lookup only returns it while tagger.current(key, tag) holds.
+
+_registry = {}
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=1024):
+        self.name = name
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.tagger = None
+        _registry[name] = self
+
+    def get_many(self, keys):
+        # Returns only the keys that were cached
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and self.tagger is not None and not self.tagger.current(key, entry[1]):
+                    del self._data[key]
+                    self.invalidations += 1
+                    entry = None
+                if entry is not None:
+                    self._data.move_to_end(key)
+                    found[key] = entry[0]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many((key,)).get(key, default)
+
+    def set_many(self, items):
+        tag = self.tagger.tag() if self.tagger is not None else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, tag)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+def cache_stats():
+    return [c.stats() for c in _registry.values()]
+
+
+def configure_caches(app):
+    # e.g. AVAILABILITY_SUMMARY_CACHE_SIZE = 20000
+    for name, cache in _registry.items():
+        cache.maxsize = app.config.get(f"{name.upper()}_CACHE_SIZE", cache.maxsize)
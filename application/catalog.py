@@ -0,0 +1,44 @@
+from collections import namedtuple
+from application.models import db, Department, Doctor, User
+from application.cache import LRUCache
+from application.coherence import bind
+
+# --------------------------------------------------------
+# ------- Cached department / doctor lists -------
+# --------------------------------------------------------
+# Plain rows (not ORM instances) so they can outlive the request session.
+
+DepartmentRow = namedtuple('DepartmentRow', ['id', 'name', 'description'])
+DoctorCard = namedtuple('DoctorCard', ['id', 'name', 'specialization', 'department_id', 'department_name'])
+
+department_cache = bind('departments', LRUCache('department_list', maxsize=8))
+doctor_cache = bind('doctors', LRUCache('doctor_list', maxsize=8))
+
+
+def list_departments():
+    rows = department_cache.get('all')
+    if rows is None:
+        rows = tuple(DepartmentRow(*r) for r in
+                     db.session.query(Department.id, Department.name, Department.description)
+                     .order_by(Department.name.asc()).all())
+        department_cache.set('all', rows)
+    return rows
+
+
+def doctor_card_query():
+    return (db.session.query(Doctor.id, User.name, Doctor.specialization, Doctor.department_id, Department.name)
+            .join(User, Doctor.user_id == User.id)
+            .outerjoin(Department, Doctor.department_id == Department.id))
+
+
+def doctor_cards(query):
+    return tuple(DoctorCard(*r) for r in query.all())
+
+
+def list_active_doctors():
+    # Non-blacklisted doctors ordered by name, as listed to patients
+    rows = doctor_cache.get('active')
+    if rows is None:
+        rows = doctor_cards(doctor_card_query().filter(Doctor.is_blacklisted == False).order_by(User.name.asc()))
+        doctor_cache.set('active', rows)
+    return rows
@@ -0,0 +1,186 @@
+import threading
+from flask import request, g
+from sqlalchemy import text
+from application.models import db, CacheGeneration
+
+# --------------------------------------------------------
+# ------- Cross-process cache coherence -------
+# --------------------------------------------------------
+# Every worker process keeps its own in-process caches. SQLite triggers bump a
+# per-scope counter in `cache_generations` on every write to the tables a scope
+# depends on; at the start of each request a worker reads those few counters
+# (one tiny query) and clears the caches of any scope whose counter moved since
+# it last looked. Writes made by this worker are seen the same way.
+#
+# Keyed scopes also record, per key (e.g. doctor), the generation of its last
+# write in `cache_key_generations`, so a booking only drops that doctor's
+# entries. Entries of bound caches are tagged with the generation the request
+# read them under and ignored once their key (or scope) changed after it, so a
+# request that read before another worker's commit cannot cache stale rows.
+
+# scope -> tables whose writes make it stale
+SCOPES = {
+    # free-slot counts only read the slot inventory, which every appointment,
+    # hold and availability write re-syncs
+    'availability': ('slots',),
+    'doctors': ('doctors', 'users', 'departments'),
+    'departments': ('departments',),
+}
+
+# scope -> the column of its tables its keys come from
+SCOPE_KEYS = {
+    'availability': 'doctor_id',
+}
+
+# Only doctor accounts feed the doctor list
+_ROW_FILTERS = {
+    ('doctors', 'users'): "{row}.role = 'doctor'",
+}
+
+_bound = {scope: [] for scope in SCOPES}
+_tracked = {scope: [] for scope in SCOPES}
+_seen = {}
+# generation at which a whole scope / one key of it last changed, as far as this worker knows
+_scope_changed = {}
+_key_changed = {scope: {} for scope in SCOPE_KEYS}
+_lock = threading.Lock()
+
+
+class _Tagger:
+    def __init__(self, scope, key):
+        self.scope = scope
+        self.key = key
+
+    def tag(self):
+        # the generation this request read the scope under (check_generations)
+        generations = g.get('cache_generations') if g else None
+        if generations is not None and self.scope in generations:
+            return generations[self.scope]
+        return _seen.get(self.scope, 0)
+
+    def current(self, key, tag):
+        changed = _scope_changed.get(self.scope, 0)
+        if self.key is not None:
+            changed = max(changed, _key_changed[self.scope].get(self.key(key), 0))
+        return tag >= changed
+
+
+def bind(scope, cache, key=None):
+    # Clear `cache` whenever `scope` changes in any process. For a keyed scope,
+    # key(cache_key) names the scope key an entry belongs to, and only entries
+    # of keys that changed are dropped
+    cache.tagger = _Tagger(scope, key)
+    _bound[scope].append(cache)
+    return cache
+
+
+def track(scope, cache):
+    # Like bind(), for caches that apply their own writes incrementally: `cache`
+    # records the generation it reflects in `cache.generation` and is cleared
+    # only when the scope's counter differs from that
+    _tracked[scope].append(cache)
+    return cache
+
+
+def _bump_key_sql(scope, key):
+    return (f"INSERT INTO cache_key_generations (scope, key_id, generation) "
+            f"SELECT scope, {key}, generation FROM cache_generations WHERE scope = '{scope}' "
+            f"ON CONFLICT (scope, key_id) DO UPDATE SET generation = excluded.generation; ")
+
+
+def _trigger_sql(scope, table, op):
+    row = 'OLD' if op == 'DELETE' else 'NEW'
+    condition = _ROW_FILTERS.get((scope, table))
+    when = f" WHEN {condition.format(row=row)}" if condition else ""
+    body = f"UPDATE cache_generations SET generation = generation + 1 WHERE scope = '{scope}'; "
+    column = SCOPE_KEYS.get(scope)
+    if column:
+        body += _bump_key_sql(scope, f"{row}.{column}")
+        if op == 'UPDATE':
+            # a row moved to another key changes the old one too
+            body += _bump_key_sql(scope, f"OLD.{column}").replace(
+                "WHERE scope", f"WHERE OLD.{column} IS NOT NEW.{column} AND scope")
+    return (f"CREATE TRIGGER IF NOT EXISTS trg_gen_{scope}_{table}_{op.lower()} "
+            f"AFTER {op} ON {table}{when} BEGIN {body}END")
+
+
+def install_triggers():
+    for scope in SCOPES:
+        if db.session.get(CacheGeneration, scope) is None:
+            db.session.add(CacheGeneration(scope=scope, generation=0))
+    db.session.commit()
+    wanted = {}
+    for scope, tables in SCOPES.items():
+        for table in tables:
+            for op in ('INSERT', 'UPDATE', 'DELETE'):
+                wanted[f"trg_gen_{scope}_{table}_{op.lower()}"] = _trigger_sql(scope, table, op)
+    # SQLite keeps the statement without IF NOT EXISTS; replace triggers from
+    # older scope definitions
+    installed = db.session.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_gen_%'")).all()
+    for name, sql in installed:
+        if wanted.get(name, '').replace('IF NOT EXISTS ', '', 1) != sql:
+            db.session.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    for sql in wanted.values():
+        db.session.execute(text(sql))
+    db.session.commit()
+
+
+def current_generations():
+    return dict(db.session.execute(text("SELECT scope, generation FROM cache_generations")).all())
+
+
+def current_generation(scope):
+    return db.session.execute(text("SELECT generation FROM cache_generations WHERE scope = :scope"),
+                              {'scope': scope}).scalar()
+
+
+def _changed_keys(scope, since):
+    return db.session.execute(text("SELECT key_id, generation FROM cache_key_generations "
+                                   "WHERE scope = :scope AND generation > :since"),
+                              {'scope': scope, 'since': since}).all()
+
+
+def check_generations():
+    # Drop local cache entries for every scope another write has touched
+    generations = current_generations()
+    g.cache_generations = generations
+    with _lock:
+        stale = {scope: _seen.get(scope) for scope, gen in generations.items() if _seen.get(scope) != gen}
+        for scope in stale:
+            _seen[scope] = generations[scope]
+    for scope, previous in stale.items():
+        keys = None
+        if scope in SCOPE_KEYS and previous is not None and previous < generations[scope]:
+            changed = _changed_keys(scope, previous)
+            with _lock:
+                known = _key_changed[scope]
+                for key, gen in changed:
+                    known[key] = max(known.get(key, 0), gen)
+            keys = {key for key, _ in changed}
+        else:
+            # unkeyed scope, or nothing known about which keys moved
+            with _lock:
+                _scope_changed[scope] = max(_scope_changed.get(scope, 0), generations[scope])
+        for cache in _bound.get(scope, ()):
+            owner = cache.tagger.key
+            if keys is None or owner is None:
+                cache.clear()
+            elif keys:
+                cache.invalidate_where(lambda k: owner(k) in keys)
+    for scope, caches in _tracked.items():
+        for cache in caches:
+            if cache.generation is not None and cache.generation != generations.get(scope):
+                cache.clear()
+    return list(stale)
+
+
+def _before_request():
+    if request.endpoint != 'static':
+        check_generations()
+
+
+def init_app(app):
+    with app.app_context():
+        install_triggers()
+    app.before_request(_before_request)
@@ -0,0 +1,85 @@
+import hashlib
+from datetime import datetime, timezone
+from itertools import chain
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, aliased
+from application.models import db, User, Doctor, Patient, Appointment, Treatment
+from application.coherence import current_generation
+
+# --------------------------------------------------------
+# ------- Conditional GET -------
+# --------------------------------------------------------
+# API responses carry an ETag (and Last-Modified where there is a timestamp to
+# give) computed from a tiny version query, so a poll whose copy is current is
+# answered 304 before anything is loaded or serialized.
+#   appointment -> updated_at of the appointment, its doctor's and patient's users
+#   patient     -> updated_at of the patient's user
+#   doctor list -> the 'doctors' coherence generation (bumped by triggers on
+#                  doctors, doctor users and departments)
+# Only users and appointments have updated_at, so a flush that changes a
+# Doctor, Patient or Treatment also touches the row that owns it.
+
+_OWNERS = {
+    Doctor: lambda obj: (User, obj.user_id),
+    Patient: lambda obj: (User, obj.user_id),
+    Treatment: lambda obj: (Appointment, obj.appointment_id),
+}
+
+
+@event.listens_for(Session, 'before_flush')
+def _touch_owners(session, flush_context, instances):
+    owners = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        owner_of = _OWNERS.get(type(obj))
+        if owner_of is None or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        owners.add(owner_of(obj))
+    now = datetime.utcnow()
+    for model, ident in owners:
+        owner = session.get(model, ident) if ident is not None else None
+        if owner is not None and owner not in session.deleted:
+            owner.updated_at = now
+
+
+def entity_tag(*parts):
+    """Opaque validator for a representation built from ``parts``."""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _latest(*stamps):
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps).replace(tzinfo=timezone.utc) if stamps else None
+
+
+_DoctorUser = aliased(User, name='stamp_doctor_user')
+_PatientUser = aliased(User, name='stamp_patient_user')
+
+
+def appointment_version(appt_id):
+    """(doctor_id, patient_id, last_modified) of an appointment, None if it does not exist."""
+    row = db.session.execute(
+        select(Appointment.doctor_id, Appointment.patient_id, Appointment.updated_at,
+               _DoctorUser.updated_at, _PatientUser.updated_at)
+        .select_from(Appointment)
+        .outerjoin(Doctor, Appointment.doctor_id == Doctor.id)
+        .outerjoin(_DoctorUser, Doctor.user_id == _DoctorUser.id)
+        .outerjoin(Patient, Appointment.patient_id == Patient.id)
+        .outerjoin(_PatientUser, Patient.user_id == _PatientUser.id)
+        .where(Appointment.id == appt_id)).first()
+    if row is None:
+        return None
+    return row[0], row[1], _latest(*row[2:])
+
+
+def patient_version(patient_id):
+    """(user_id, last_modified) of a patient, None if it does not exist."""
+    row = db.session.execute(
+        select(User.id, User.updated_at).join(Patient, Patient.user_id == User.id)
+        .where(Patient.id == patient_id)).first()
+    if row is None:
+        return None
+    return row[0], _latest(row[1])
+
+
+def doctors_version():
+    return current_generation('doctors')
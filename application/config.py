@@ -7,4 +7,14 @@ class LocalDevelopmentConfig:
     DEBUG=  True
     SECRET_KEY ="dev"
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{DB_PATH}"
-    SQLALCHEMY_TRACK_MODIFICATIONS= False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS= False
+    AVAILABILITY_SUMMARY_CACHE_SIZE = 4096
+    SLOT_HOLD_TTL_SECONDS = 300
+    SLOT_HOLD_SWEEP_SECONDS = 30
+    BULK_AVAILABILITY_MAX_WINDOWS = 500
+    APPOINTMENT_COUNT_TTL_SECONDS = 60
+    AUTOCOMPLETE_MAX_AGE_SECONDS = 300
+    EXPORT_BATCH_SIZE = 1000
+    APPOINTMENT_BATCH_MAX_OPERATIONS = 200
+    ARCHIVE_HORIZON_DAYS = 730
+    ARCHIVE_BATCH_SIZE = 1000
\ No newline at end of file
@@ -1,10 +1,22 @@
 from functools import wraps
-from flask import request, redirect, url_for, flash, session, Blueprint, render_template, abort
+from flask import request, redirect, url_for, flash, session, Blueprint, render_template, abort, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import or_, cast, String, and_, func
+from sqlalchemy import or_, and_
 from application.models import *
 from application.forms import *
+from application.availability import availability_matrix, free_slots_for, earliest_free_slots, department_doctor_ids
+from application.schedule import SlotBitmap
+from application.holds import place_hold, release_holds, active_hold
+from application.catalog import list_departments, list_active_doctors, doctor_card_query, doctor_cards
+from application.recurring import weekday_mask, describe_weekdays
+from application.bulk_availability import add_windows, parse_time_ranges, weekly_windows
+from application.search import filter_doctors
+from application.appointment_search import search_appointments, approximate_count, DEFAULT_PAGE_SIZE
+from application.patient_lookup import lookup_patients
+from application.autocomplete import doctor_autocomplete
+from application.dashboards import patient_dashboard, doctor_dashboard, admin_dashboard
+from application.archive import archived_history, has_archived
 from datetime import datetime, timedelta, date
 from sqlalchemy.exc import IntegrityError
 from wtforms.validators import Optional
@@ -132,7 +144,7 @@ def _get_or_create_department(name:str):
     return dept
 
 def _populate_department_choices(form):
-    departments=Department.query.order_by(Department.name.asc()).all()
+    departments=list_departments()
     choices=[(0,"-- No department--")]
     choices+=[(dept.id,dept.name) for dept in departments]
     form.department.choices=choices
@@ -141,12 +153,13 @@ def _populate_department_choices(form):
 @login_required
 @role_required('admin')
 def dashboard():
-    total_doctors = Doctor.query.count()
-    total_patients = Patient.query.count()
-    total_appointments = Appointment.query.count()
-    booked_appts = Appointment.query.filter_by(status='Booked').count()
-    completed_appts=Appointment.query.filter_by(status='Completed').count()
-    cancelled_appts=Appointment.query.filter_by(status='Cancelled').count()
+    counters=admin_dashboard().counters
+    total_doctors = counters.doctors
+    total_patients = counters.patients
+    total_appointments = counters.appointments
+    booked_appts = counters.booked
+    completed_appts=counters.completed
+    cancelled_appts=counters.cancelled
 
     status_labels = ["Booked", "Completed", "Cancelled"]
     status_values = [booked_appts, completed_appts, cancelled_appts]
@@ -160,9 +173,10 @@ def dashboard():
 def doctors_list():
     q=request.args.get('q','').strip()
     query=db.session.query(Doctor).join(User)
+    rank=None
     if q:
-        query=query.filter(or_(User.name.ilike(f'%{q}%'), Doctor.specialization.ilike(f'%{q}%')))
-    doctors=query.order_by(User.id.asc()).all()
+        query,rank=filter_doctors(query, q)
+    doctors=query.order_by(*([rank] if rank is not None else []), User.id.asc()).all()
     form=SearchForm(q=q)
     return render_template('admin_doctors_list.html', doctors=doctors, form=form)
 
@@ -187,6 +201,7 @@ def doctor_create():
         doctor=Doctor(user_id=user.id, department_id=department_id, specialization=form.specialization.data.strip() or None)
         db.session.add(doctor)
         db.session.commit()
+        doctor_autocomplete.doctor_changed(doctor.id)
         flash('Doctor created successfully', 'success')
         return redirect(url_for('admin.doctors_list'))
     return render_template('admin_doctors_form.html', form=form, mode="create")
@@ -212,6 +227,7 @@ def doctor_edit(doctor_id):
         department_id=form.department.data or 0
         doctor.department_id=department_id if department_id!=0 else None
         db.session.commit()
+        doctor_autocomplete.doctor_changed(doctor.id)
         flash('Doctor updated successfully', 'success')
         return redirect(url_for('admin.doctors_list'))
 
@@ -232,7 +248,7 @@ def doctor_edit(doctor_id):
 def doctor_delete(doctor_id):
     doctor=Doctor.query.get_or_404(doctor_id)
     user=doctor.user
-    if getattr(doctor, "appointments", None) and len(doctor.appointments) > 0:
+    if (getattr(doctor, "appointments", None) and len(doctor.appointments) > 0) or has_archived(doctor_id=doctor.id):
         flash("Cannot delete doctor with appointments."
               "Please cancel/reassign all appointments first or use blaklist instead.",
               "danger")
@@ -240,6 +256,7 @@ def doctor_delete(doctor_id):
     db.session.delete(doctor)
     db.session.delete(user)
     db.session.commit()
+    doctor_autocomplete.doctor_changed(doctor_id)
     flash("Doctor deleted successfully","success")
     return redirect(url_for('admin.doctors_list'))
 
@@ -251,6 +268,7 @@ def doctor_blacklist(doctor_id):
     doc=Doctor.query.get_or_404(doctor_id)
     doc.is_blacklisted=not doc.is_blacklisted
     db.session.commit()
+    doctor_autocomplete.doctor_changed(doc.id)
     flash(f"Doctor blacklist status: {'Blacklisted' if doc.is_blacklisted else 'Active'}","success")
     return redirect(url_for('admin.doctors_list'))
 
@@ -260,14 +278,8 @@ def doctor_blacklist(doctor_id):
 @role_required('admin')
 def patients_list():
     q=request.args.get('q','').strip()
-    query=db.session.query(Patient).join(User)
-    if q:
-        query=query.filter(or_(
-            User.name.ilike(f'%{q}%'), 
-            User.email.ilike(f'%{q}%'),
-            cast(Patient.id, String).ilike(f'%{q}%'),
-            Patient.phone.ilike(f'%{q}%')))
-    patients=query.order_by(User.id.asc()).all()
+    # id/phone, email prefix or name, each through its own index
+    patients=lookup_patients(q).order_by(User.id.asc()).all()
     form=SearchForm(q=q)
     return render_template('admin_patients_list.html', patients=patients, form=form)
 
@@ -350,7 +362,7 @@ def patient_edit(patient_id):
 @role_required('admin')
 def patient_delete(patient_id):
     patient=Patient.query.get_or_404(patient_id)
-    if patient.appointments and len(patient.appointments)>0:
+    if (patient.appointments and len(patient.appointments)>0) or has_archived(patient_id=patient.id):
         flash("Patient has appointments, cannot be deleted","danger")
         return redirect(url_for('admin.patients_list'))
     
@@ -378,23 +390,13 @@ def patient_blacklist(patient_id):
 @role_required('admin')
 def appointments_list():
     q=request.args.get("q","").strip().lower()
-    appointments= Appointment.query.order_by(Appointment.appt_date.desc(),Appointment.appt_time.desc()).all()
-    if q:
-        results=[]
-        for a in appointments:
-            doctor_name=a.doctor.user.name.lower() if a.doctor and a.doctor.user and a.doctor.user.name else ""
-            patient_name=a.patient.user.name.lower() if a.patient and a.patient.user and a.patient.user.name else ""
-            status=(a.status or "").lower()
-            date_str=a.appt_date.isoformat() if a.appt_date else ""
-            if (
-                q in doctor_name or
-                q in patient_name or
-                q in status or
-                q in date_str
-            ):
-                results.append(a)
-        appointments=results
-    return render_template('admin_appointments_list.html', appointments=appointments, q=q)
+    per_page=min(max(request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE, 10), 200)
+    try:
+        appointments,next_cursor,prev_cursor=search_appointments(q, after=request.args.get('after'), before=request.args.get('before'), limit=per_page)
+    except ValueError:
+        return redirect(url_for('admin.appointments_list', q=q or None))
+    total=approximate_count(q)
+    return render_template('admin_appointments_list.html', appointments=appointments, q=q, total=total, per_page=per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 # Appointment set status
 @admin_bp.route('/appointments/<int:appt_id>/status', methods=['POST'])
@@ -485,25 +487,15 @@ def _require_doctor_and_get():
 @role_required('doctor')
 def dashboard():
     doctor=_require_doctor_and_get()
-    today=date.today()
-    start_week=today-timedelta(days=today.weekday())
-    end_week=start_week+timedelta(days=6)
-
-    today_appointments=Appointment.query.filter_by(doctor_id=doctor.id).filter(Appointment.appt_date==today).order_by(Appointment.appt_date.asc(), Appointment.appt_time.asc()).all()
-    weekly_appointments=Appointment.query.filter_by(doctor_id=doctor.id).filter(Appointment.appt_date.between(start_week,end_week)).filter(Appointment.status=='Booked').order_by(Appointment.appt_date.asc(), Appointment.appt_time.asc()).all()
-    
-    patients = (db.session.query(Patient).join(User, Patient.user_id == User.id).join(Appointment, Appointment.patient_id == Patient.id).filter(Appointment.doctor_id == doctor.id).group_by(Patient.id, User.name).order_by(User.name.asc()).limit(10).all())
-
-    # For chart data(appointment status distribution)
-    status_rows=(db.session.query(Appointment.status,func.count(Appointment.id)).filter(Appointment.doctor_id == doctor.id).group_by(Appointment.status).all())
+    data=doctor_dashboard(doctor)
     status_labels=[]
     status_values=[]
-    for status, count in status_rows:
+    for status, count in data.status_totals.items():
         if count and count>0:
             status_labels.append(status)
             status_values.append(count)
     
-    return render_template('doctor_dashboard.html', today_appts=today_appointments,weekly_appts=weekly_appointments, patients=patients, status_labels=status_labels, status_values=status_values)
+    return render_template('doctor_dashboard.html', today_appts=data.today,weekly_appts=data.week, patients=data.patients, status_labels=status_labels, status_values=status_values)
 
 # Doctor appointments listed by day and week
 @doctor_bp.route('/appointments')
@@ -579,8 +571,12 @@ def appointment_treatment(appt_id):
 def patient_history(patient_id):
     doctor=_require_doctor_and_get()
     appts=Appointment.query.filter_by(patient_id=patient_id, doctor_id=doctor.id).order_by(Appointment.appt_date.desc(), Appointment.appt_time.desc()).all()
+    # archived appointments are all older than these: read only when asked for, or when there are none here
+    older=request.args.get('older')=='1' or not appts
+    if older:
+        appts+=archived_history(patient_id=patient_id, doctor_id=doctor.id)
     pat=Patient.query.get_or_404(patient_id)
-    return render_template('doctor_patient_history.html',appts=appts,patient=pat)
+    return render_template('doctor_patient_history.html',appts=appts,patient=pat,older=older)
 
 # 7 days availability
 @doctor_bp.route('/availability',methods=['GET','POST'])
@@ -614,7 +610,127 @@ def availability():
     today=date.today()
     limit= today+timedelta(days=7)
     slots=DoctorAvailability.query.filter_by(doctor_id=doctor.id).filter(DoctorAvailability.avail_date.between(today,limit)).order_by(DoctorAvailability.avail_date.asc(), DoctorAvailability.start_time.asc()).all()
-    return render_template('doctor_availability.html',form=form,slots=slots)
+    templates=AvailabilityTemplate.query.filter_by(doctor_id=doctor.id).filter(or_(AvailabilityTemplate.valid_until.is_(None), AvailabilityTemplate.valid_until >= today)).order_by(AvailabilityTemplate.start_time.asc()).all()
+    exceptions=AvailabilityException.query.filter_by(doctor_id=doctor.id).filter(AvailabilityException.exc_date >= today).order_by(AvailabilityException.exc_date.asc()).all()
+    return render_template('doctor_availability.html',form=form,slots=slots,bulk_form=BulkAvailabilityForm(),template_form=AvailabilityTemplateForm(),exception_form=AvailabilityExceptionForm(),templates=templates,exceptions=exceptions,describe_weekdays=describe_weekdays)
+
+# Many windows at once, e.g. Mon-Fri 09:00-12:00 and 14:00-17:00 for the next four weeks
+@doctor_bp.route('/availability/bulk',methods=['POST'])
+@login_required
+@role_required('doctor')
+def availability_bulk():
+    doctor=_require_doctor_and_get()
+    form=BulkAvailabilityForm()
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for e in errors:
+                flash(e,'warning')
+        return redirect(url_for('doctor.availability'))
+    if form.end_date.data < form.start_date.data:
+        flash('End date must not be before start date','warning')
+        return redirect(url_for('doctor.availability'))
+    try:
+        ranges=parse_time_ranges(form.times.data)
+    except ValueError:
+        flash('Time ranges must look like 09:00-12:00, 14:00-17:00','warning')
+        return redirect(url_for('doctor.availability'))
+    try:
+        accepted,rejected=add_windows(doctor.id, weekly_windows(form.start_date.data, form.end_date.data, form.weekdays.data, ranges))
+    except ValueError as e:
+        flash(str(e),'warning')
+        return redirect(url_for('doctor.availability'))
+    if accepted:
+        flash(f'{len(accepted)} availability slots added','success')
+    for (day,start_time,end_time),reason in rejected[:5]:
+        flash(f"Skipped {day.isoformat()} {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}: {reason}",'warning')
+    if len(rejected)>5:
+        flash(f'... and {len(rejected)-5} more skipped','warning')
+    if not accepted and not rejected:
+        flash('No dates in that range fall on the chosen weekdays','info')
+    return redirect(url_for('doctor.availability'))
+
+# Weekly recurring hours, expanded on demand instead of one row per day
+@doctor_bp.route('/availability/templates',methods=['POST'])
+@login_required
+@role_required('doctor')
+def availability_template_add():
+    doctor=_require_doctor_and_get()
+    form=AvailabilityTemplateForm()
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for e in errors:
+                flash(e,'warning')
+    elif form.end_time.data <= form.start_time.data:
+        flash('End time must be after start time','warning')
+    elif form.valid_from.data and form.valid_until.data and form.valid_until.data < form.valid_from.data:
+        flash('Valid until must not be before valid from','warning')
+    else:
+        template=AvailabilityTemplate(
+            doctor_id=doctor.id,
+            weekdays=weekday_mask(form.weekdays.data),
+            start_time=form.start_time.data,
+            end_time=form.end_time.data,
+            valid_from=form.valid_from.data,
+            valid_until=form.valid_until.data
+        )
+        try:
+            db.session.add(template)
+            db.session.commit()
+            flash(f'Weekly hours added ({describe_weekdays(template.weekdays)})','success')
+        except Exception as e:
+            db.session.rollback()
+            flash('Error adding weekly hours','danger')
+    return redirect(url_for('doctor.availability'))
+
+@doctor_bp.route('/availability/templates/<int:template_id>/delete',methods=['POST'])
+@login_required
+@role_required('doctor')
+def availability_template_delete(template_id):
+    doctor=_require_doctor_and_get()
+    template=AvailabilityTemplate.query.get_or_404(template_id)
+    if template.doctor_id != doctor.id:
+        abort(403)
+    try:
+        db.session.delete(template)
+        db.session.commit()
+        flash('Weekly hours deleted','success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error deleting weekly hours','danger')
+    return redirect(url_for('doctor.availability'))
+
+# Dates on which the weekly hours do not apply
+@doctor_bp.route('/availability/exceptions',methods=['POST'])
+@login_required
+@role_required('doctor')
+def availability_exception_add():
+    doctor=_require_doctor_and_get()
+    form=AvailabilityExceptionForm()
+    if form.validate_on_submit():
+        exc=AvailabilityException(doctor_id=doctor.id,exc_date=form.date.data,reason=form.reason.data or None)
+        try:
+            db.session.add(exc)
+            db.session.commit()
+            flash(f'Weekly hours skipped on {exc.exc_date.isoformat()}','success')
+        except IntegrityError:
+            db.session.rollback()
+            flash('That date is already skipped','warning')
+    else:
+        flash('Please pick a valid date','warning')
+    return redirect(url_for('doctor.availability'))
+
+@doctor_bp.route('/availability/exceptions/<int:exc_id>/delete',methods=['POST'])
+@login_required
+@role_required('doctor')
+def availability_exception_delete(exc_id):
+    doctor=_require_doctor_and_get()
+    exc=AvailabilityException.query.get_or_404(exc_id)
+    if exc.doctor_id != doctor.id:
+        abort(403)
+    db.session.delete(exc)
+    db.session.commit()
+    flash('Weekly hours restored','success')
+    return redirect(url_for('doctor.availability'))
 
 @doctor_bp.route('/availability/<int:slot_id>/delete',methods=['POST'])
 @login_required
@@ -695,33 +811,33 @@ def _return_if_redirect(obj):
     return hasattr(obj, 'status_code')
 
 def _thirty_minutes_slots(start_time, end_time):
-    slots=[]
-    current=datetime.combine(date.today(), start_time)
-    end_date=datetime.combine(date.today(), end_time)
-    while current + timedelta(minutes=30) <= end_date:
-        slots.append(current.time())
-        current += timedelta(minutes=30)
-    return slots
+    return SlotBitmap.from_window(start_time, end_time).times()
 
 def _available_slots_for(doctor_id, target_date):
-    # No same day booking
-    if target_date <= date.today():
-        return []
-    # Find all available slot for that date
-    window=DoctorAvailability.query.filter_by(doctor_id=doctor_id, avail_date=target_date).all()
-    slots_set=set()
-    
-    for w in window:
-        current_dt=datetime.combine(target_date, w.start_time)
-        end_dt=datetime.combine(target_date, w.end_time)
-        while current_dt + timedelta(minutes=30) <= end_dt:
-            slots_set.add(current_dt.time())
-            current_dt += timedelta(minutes=30)
-    if not slots_set:
-        return []
-    occupied=set(t[0] for t in db.session.query(Appointment.appt_time).filter(Appointment.doctor_id==doctor_id, Appointment.appt_date==target_date, Appointment.status.in_(['Booked', 'Completed']),).all())
-    available=[t for t in slots_set if t not in occupied]
-    return sorted(available)
+    return free_slots_for(doctor_id, target_date)
+
+def _hold_covers(hold, selected_date, time_str):
+    return bool(hold and selected_date and hold.slot_date == selected_date and hold.slot_time.strftime('%H:%M') == time_str)
+
+def _times_for(doctor_id, selected_date, hold):
+    # Free slots plus the patient's own held slot (hidden from everyone else)
+    times=_available_slots_for(doctor_id, selected_date)
+    if hold and hold.slot_date == selected_date:
+        times=sorted(set(times) | {hold.slot_time})
+    return [t.strftime('%H:%M') for t in times]
+
+def _hold_minutes_left(hold):
+    if not hold:
+        return None
+    return max(int((hold.held_until - datetime.utcnow()).total_seconds() // 60), 0)
+
+def _place_hold_and_flash(doctor_id, selected_date, selected_time_str, patient_id):
+    selected_time_obj=datetime.strptime(selected_time_str, '%H:%M').time()
+    if place_hold(doctor_id, selected_date, selected_time_obj, patient_id):
+        minutes=current_app.config.get('SLOT_HOLD_TTL_SECONDS', 300) // 60
+        flash(f"Slot {selected_time_str} is held for you for {minutes} minutes. Confirm to complete.", "info")
+    else:
+        flash("Someone else has just selected this slot. Please choose another time.", "warning")
 
 def _next_7_days(exclude_today=True):
     start=date.today() + timedelta(days=1 if exclude_today else 0)
@@ -735,39 +851,18 @@ def dashboard():
     pat=_require_patient_and_get()
     if _return_if_redirect(pat):
         return pat
-    today=date.today()
-    upcoming=Appointment.query.filter_by(patient_id=pat.id).filter(Appointment.appt_date>today).filter(Appointment.status=='Booked').order_by(Appointment.appt_date.asc(), Appointment.appt_time.asc()).limit(10).all()
-    past=Appointment.query.filter_by(patient_id=pat.id).filter(Appointment.appt_date<=today).order_by(Appointment.appt_date.desc(), Appointment.appt_time.desc()).limit(10).all()
-
-    departments=Department.query.order_by(Department.name.asc()).all()
-    doctors=db.session.query(Doctor).join(User,Doctor.user_id==User.id).filter(Doctor.is_blacklisted==False).order_by(User.name.asc()).all()
-
-    days=_next_7_days(exclude_today=True)
-    availability_summary={}
-    for d in doctors:
-        per_day=[]
-        for dt in days:
-            per_day.append(len(_available_slots_for(d.id, dt)))
-        availability_summary[d.id]=per_day
-    
-    status_order=['Completed','Booked','Cancelled']
-    rows=(db.session.query(User.name, Appointment.status, func.count(Appointment.id)).join(Doctor, Doctor.user_id==User.id).join(Appointment, Appointment.doctor_id==Doctor.id).filter(Appointment.patient_id==pat.id).group_by(User.name, Appointment.status).all())
-    counts_map={}
-    doctor_names_set=set()
-    for name, status, count in rows:
-        doctor_names_set.add(name)
-        counts_map[(name, status)]=count
-    doctor_labels=sorted(doctor_names_set)
+    data=patient_dashboard(pat)
+    doctor_labels=[]
     booked_counts=[]
     completed_counts=[]
     cancelled_counts=[]
-    for name in doctor_labels:
-        booked_counts.append(counts_map.get((name, 'Booked'), 0))
-        completed_counts.append(counts_map.get((name, 'Completed'), 0))
-        cancelled_counts.append(counts_map.get((name, 'Cancelled'), 0))
-
+    for (doctor_id, name), counts in sorted(data.status_counts.items(), key=lambda kv: kv[0][1]):
+        doctor_labels.append(name)
+        booked_counts.append(counts.get('Booked', 0))
+        completed_counts.append(counts.get('Completed', 0))
+        cancelled_counts.append(counts.get('Cancelled', 0))
 
-    return render_template('patient_dashboard.html', upcoming=upcoming, past=past, doctors=doctors, availability_summary=availability_summary, days=days, departments=departments, doctor_labels=doctor_labels, booked_counts=booked_counts, completed_counts=completed_counts, cancelled_counts=cancelled_counts)
+    return render_template('patient_dashboard.html', upcoming=data.upcoming, past=data.past, doctors=data.doctors, availability_summary=data.availability, days=data.days, departments=data.departments, doctor_labels=doctor_labels, booked_counts=booked_counts, completed_counts=completed_counts, cancelled_counts=cancelled_counts)
 
 # Patient search doctors
 @patient_bp.route('/doctors')
@@ -779,22 +874,34 @@ def search_doctors():
         return pat
     form=SearchForm(q=request.args.get('q','').strip())
     q=form.q.data or ''
-    query=db.session.query(Doctor).join(User, Doctor.user_id==User.id).filter(Doctor.is_blacklisted==False)
     if q:
-        like_q=f'%{q}%'
-        query=query.filter(or_(User.name.ilike(like_q), Doctor.specialization.ilike(like_q)))
-    doctors=query.order_by(User.name.asc()).all()
+        query,rank=filter_doctors(doctor_card_query().filter(Doctor.is_blacklisted==False), q)
+        doctors=doctor_cards(query.order_by(*([rank] if rank is not None else []), User.name.asc()))
+    else:
+        doctors=list_active_doctors()
 
     days=_next_7_days(exclude_today=True)
-    availability_summary={}
-    for d in doctors:
-        per_day_count=[]
-        for dt in days:
-            per_day_count.append(len(_available_slots_for(d.id, dt)))
-        availability_summary[d.id]=per_day_count
-        
+    availability_summary=availability_matrix([d.id for d in doctors], days)
+
     return render_template('patient_doctors_search.html', form=form, doctors=doctors, availability_summary=availability_summary, days=days)
 
+# Patient earliest slots across a department
+@patient_bp.route('/departments/<int:dept_id>/earliest')
+@login_required
+@role_required('patient')
+def earliest_slots(dept_id):
+    pat=_require_patient_and_get()
+    if _return_if_redirect(pat):
+        return pat
+    dept=Department.query.get_or_404(dept_id)
+    limit=min(max(request.args.get('n', 5, type=int), 1), 50)
+    days=_next_7_days(exclude_today=True)
+    slots=earliest_free_slots(department_doctor_ids(dept.id), days[0], days[-1], limit)
+    doctors={d.id: d for d in list_active_doctors()}
+    results=[(day, t.strftime('%H:%M'), doctors.get(doc_id)) for day, t, doc_id in slots]
+    form=AppointmentBookForm()
+    return render_template('patient_earliest_slots.html', department=dept, results=results, limit=limit, form=form)
+
 # Patient book appointment
 @patient_bp.route('/doctors/book/<int:doctor_id>', methods=['GET', 'POST'])
 @login_required
@@ -823,12 +930,21 @@ def book_appointment(doctor_id):
         except ValueError:
             selected_date = None
 
+    # action: 'hold' reserves the chosen time, 'book' (default) books it, 'release' drops the hold
+    action = request.form.get('action', 'book') if request.method == 'POST' else None
+    hold = active_hold(pat.id, doc.id)
+    converting = action == 'book' and _hold_covers(hold, selected_date, request.form.get('time'))
+
     available_times = []
-    if selected_date:
-        available_times = [dt.strftime('%H:%M') for dt in _available_slots_for(doc.id, selected_date)]
+    if selected_date and not converting:
+        available_times = _times_for(doc.id, selected_date, hold)
 
     if request.method == 'POST' and form.validate_on_submit():
-       
+        if action == 'release':
+            release_holds(pat.id, doc.id)
+            flash("Held slot released.", "info")
+            return redirect(url_for('patient.book_appointment', doctor_id=doctor_id, date=selected_date.isoformat() if selected_date else None))
+
         if not selected_date:
             flash("Please select a valid date.", "danger")
             return redirect(url_for('patient.book_appointment', doctor_id=doctor_id))
@@ -843,12 +959,14 @@ def book_appointment(doctor_id):
             flash("Please choose a time slot.", "danger")
             return redirect(url_for('patient.book_appointment', doctor_id=doctor_id, date=selected_date.isoformat()))
 
-        if selected_time_str not in set(available_times):
+        if not converting and selected_time_str not in set(available_times):
             flash("Selected time is not available for the chosen date. Please choose another time.", "danger")
             return redirect(url_for('patient.book_appointment', doctor_id=doctor_id, date=selected_date.isoformat()))
 
         selected_time_obj = datetime.strptime(selected_time_str, '%H:%M').time()
 
+        # The checks below run before a hold too, so a slot is never held for a
+        # booking that would be refused. A refused booking frees the patient's hold.
         # At most one future booked appt per doctor per patient ---
         existing_future = Appointment.query.filter(
             Appointment.patient_id == pat.id,
@@ -857,6 +975,7 @@ def book_appointment(doctor_id):
             Appointment.appt_date >= date.today()
         ).first()
         if existing_future:
+            release_holds(pat.id, doc.id)
             flash("You already have a future booked appointment with this doctor.", "warning")
             return redirect(url_for('patient.appointments'))
         
@@ -868,8 +987,14 @@ def book_appointment(doctor_id):
             Appointment.appt_time == selected_time_obj
         ).first()
         if time_conflict:
+            release_holds(pat.id, doc.id)
             flash("You already have another appointment at this time.", "warning")
             return redirect(url_for('patient.appointments'))
+
+        if action == 'hold':
+            _place_hold_and_flash(doc.id, selected_date, selected_time_str, pat.id)
+            return redirect(url_for('patient.book_appointment', doctor_id=doctor_id, date=selected_date.isoformat()))
+
         appt = Appointment(
             patient_id=pat.id,
             doctor_id=doc.id,
@@ -885,10 +1010,12 @@ def book_appointment(doctor_id):
             return redirect(url_for('patient.dashboard'))
         except IntegrityError:
             db.session.rollback()
+            release_holds(pat.id, doc.id)
             flash("Selected slot is no longer available. Please choose another time.", "danger")
             return redirect(url_for('patient.book_appointment', doctor_id=doctor_id, date=selected_date.isoformat()))
         except Exception:
             db.session.rollback()
+            release_holds(pat.id, doc.id)
             flash("Failed to book appointment. Please try again.", "danger")
             return redirect(url_for('patient.book_appointment', doctor_id=doctor_id, date=selected_date.isoformat()))
     return render_template(
@@ -898,7 +1025,9 @@ def book_appointment(doctor_id):
         days=days,
         selected_date=selected_date,
         available_times=available_times,
-        selected_time=None
+        selected_time=None,
+        hold=hold,
+        hold_minutes_left=_hold_minutes_left(hold)
     )
 
 
@@ -954,12 +1083,19 @@ def reschedule(appt_id):
             selected_date=datetime.strptime(selected_date_str,'%Y-%m-%d').date()
         except ValueError:
             selected_date=None
+    action=request.form.get('action','book') if request.method=='POST' else None
+    hold=active_hold(pat.id, doc.id)
+    converting=action=='book' and _hold_covers(hold, selected_date, request.form.get('time'))
     availablity_times=[]
     
-    if selected_date:
-        availablity_times=[dt.strftime('%H:%M') for dt in _available_slots_for(doc.id, selected_date)]
+    if selected_date and not converting:
+        availablity_times=_times_for(doc.id, selected_date, hold)
     
     if request.method=='POST' and form.validate_on_submit():
+        if action=='release':
+            release_holds(pat.id, doc.id)
+            flash("Held slot released.","info")
+            return redirect(url_for('patient.reschedule', appt_id=appt.id, date=selected_date.isoformat() if selected_date else None))
         if not selected_date:
             flash("Please select a valid date.","danger")
             return redirect(url_for('patient.reschedule', appt_id=appt.id))
@@ -973,13 +1109,13 @@ def reschedule(appt_id):
         if not selected_time_str:
             flash("Please choose a time slot.","danger")
             return redirect(url_for('patient.reschedule', appt_id=appt.id, date=selected_date.isoformat()))
-        if selected_time_str not in set(availablity_times):
+        if not converting and selected_time_str not in set(availablity_times):
             flash("Selected time is not available for the chosen date. Please choose another time.","danger")
             return redirect(url_for('patient.reschedule', appt_id=appt.id, date=selected_date.isoformat()))
-        
+
         selected_time_obj=datetime.strptime(selected_time_str,'%H:%M').time()
 
-        
+        # checked before a hold too; a refused reschedule frees the patient's hold
         conflict=Appointment.query.filter(
             Appointment.patient_id==pat.id,
             Appointment.status=='Booked',
@@ -988,9 +1124,14 @@ def reschedule(appt_id):
             Appointment.id != appt.id
         ).first()
         if conflict:
+            release_holds(pat.id, doc.id)
             flash("You already have another appointment at this time.","warning")
             return redirect(url_for('patient.appointments'))
 
+        if action=='hold':
+            _place_hold_and_flash(doc.id, selected_date, selected_time_str, pat.id)
+            return redirect(url_for('patient.reschedule', appt_id=appt.id, date=selected_date.isoformat()))
+
         appt.appt_date=selected_date
         appt.appt_time=selected_time_obj
         try:
@@ -999,13 +1140,15 @@ def reschedule(appt_id):
             return redirect(url_for('patient.appointments'))
         except IntegrityError:
             db.session.rollback()
+            release_holds(pat.id, doc.id)
             flash("Selected slot is no longer available. Please choose another time.","danger")
             return redirect(url_for('patient.reschedule', appt_id=appt.id, date=selected_date.isoformat()))
         except Exception:
             db.session.rollback()
+            release_holds(pat.id, doc.id)
             flash("Failed to reschedule appointment. Please try again.","danger")
             return redirect(url_for('patient.reschedule', appt_id=appt.id, date=selected_date.isoformat()))
-    return render_template('patient_reschedule.html', appt=appt, doctor=doc, form=form, days=days, selected_date=selected_date, availablity_times=availablity_times)
+    return render_template('patient_reschedule.html', appt=appt, doctor=doc, form=form, days=days, selected_date=selected_date, availablity_times=availablity_times, hold=hold, hold_minutes_left=_hold_minutes_left(hold))
 
 # Patient cancel appointment
 @patient_bp.route('/appointments/cancel/<int:appt_id>', methods=['GET','POST'])
@@ -1047,7 +1190,11 @@ def history():
     if _return_if_redirect(pat):
         return pat
     appts=Appointment.query.filter_by(patient_id=pat.id, status='Completed').order_by(Appointment.appt_date.desc(), Appointment.appt_time.desc()).all()
-    return render_template('patient_history.html', appts=appts)
+    # archived appointments are all older than these: read only when asked for, or when there are none here
+    older=request.args.get('older')=='1' or not appts
+    if older:
+        appts+=archived_history(patient_id=pat.id, status='Completed')
+    return render_template('patient_history.html', appts=appts, older=older)
 
 # Patient profile view and edit
 @patient_bp.route('/profile', methods=['GET','POST'])
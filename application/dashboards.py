@@ -0,0 +1,87 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from types import SimpleNamespace
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
+from application.models import db, User, Doctor, Patient, Appointment
+from application.availability import availability_matrix
+from application.catalog import list_departments, list_active_doctors
+from application import stats, rollups
+
+# --------------------------------------------------------
+# ------- Dashboard data -------
+# --------------------------------------------------------
+# Everything a role's dashboard shows, gathered with a fixed number of queries
+# whatever the number of appointments or doctors. The HTML dashboards render
+# these namespaces and /api/dashboard serializes them, so both always agree.
+#   patient -> upcoming, past, departments, doctors, days, availability, status_counts
+#   doctor  -> today, week, patients, status_totals
+#   admin   -> counters
+
+STATUSES = ('Booked', 'Completed', 'Cancelled')
+
+RECENT_LIMIT = 10
+
+
+# what the appointment tables and appointment_to_dict read: names joined in,
+# treatments in one IN query
+def _with_names(query):
+    return query.options(joinedload(Appointment.doctor).joinedload(Doctor.user),
+                         joinedload(Appointment.patient).joinedload(Patient.user),
+                         selectinload(Appointment.treatment))
+
+
+def _next_days(n=7):
+    start = date.today() + timedelta(days=1)
+    return [start + timedelta(days=i) for i in range(n)]
+
+
+def patient_dashboard(patient):
+    today = date.today()
+    mine = _with_names(Appointment.query.filter(Appointment.patient_id == patient.id))
+    upcoming = (mine.filter(Appointment.appt_date > today, Appointment.status == 'Booked')
+                .order_by(Appointment.appt_date.asc(), Appointment.appt_time.asc()).limit(RECENT_LIMIT).all())
+    past = (mine.filter(Appointment.appt_date <= today)
+            .order_by(Appointment.appt_date.desc(), Appointment.appt_time.desc()).limit(RECENT_LIMIT).all())
+
+    departments = list_departments()
+    doctors = list_active_doctors()
+    days = _next_days()
+    availability = availability_matrix([d.id for d in doctors], days)
+
+    # {(doctor_id, name): {status: count}} for every doctor the patient has seen
+    rows = (db.session.query(Doctor.id, User.name, Appointment.status, func.count(Appointment.id))
+            .join(User, Doctor.user_id == User.id).join(Appointment, Appointment.doctor_id == Doctor.id)
+            .filter(Appointment.patient_id == patient.id)
+            .group_by(Doctor.id, User.name, Appointment.status).all())
+    status_counts = defaultdict(dict)
+    for doctor_id, name, status, count in rows:
+        status_counts[(doctor_id, name)][status] = count
+    return SimpleNamespace(upcoming=upcoming, past=past, departments=departments, doctors=doctors,
+                           days=days, availability=availability, status_counts=dict(status_counts))
+
+
+def doctor_dashboard(doctor):
+    today = date.today()
+    start_week = today - timedelta(days=today.weekday())
+    end_week = start_week + timedelta(days=6)
+
+    # One query over the doctor's week; today's list and the booked list are
+    # cut from it here
+    week = (_with_names(Appointment.query)
+            .filter(Appointment.doctor_id == doctor.id, Appointment.appt_date.between(start_week, end_week))
+            .order_by(Appointment.appt_date.asc(), Appointment.appt_time.asc()).all())
+
+    # Distinct patients come from ix_appointments_doctor_patient alone
+    seen = db.session.query(Appointment.patient_id).filter(Appointment.doctor_id == doctor.id)
+    patients = (Patient.query.join(User, Patient.user_id == User.id).options(contains_eager(Patient.user))
+                .filter(Patient.id.in_(seen)).order_by(User.name.asc()).limit(RECENT_LIMIT).all())
+
+    return SimpleNamespace(today=[a for a in week if a.appt_date == today],
+                           week=[a for a in week if a.status == 'Booked'],
+                           patients=patients,
+                           status_totals=rollups.status_totals(doctor_id=doctor.id))
+
+
+def admin_dashboard():
+    return SimpleNamespace(counters=stats.snapshot())
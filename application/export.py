@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from itertools import chain
+from flask import current_app
+from application.models import Appointment, ArchivedAppointment
+from application.archive import with_names as with_archived_names
+from application.api.serializers import appointment_to_dict
+
+# --------------------------------------------------------
+# ------- Appointment export -------
+# --------------------------------------------------------
+# Full-history dumps for reporting, as NDJSON (one API-shaped appointment per
+# line, treatment nested) or CSV (treatment flattened into treatment_* columns).
+# Rows are read as plain columns EXPORT_BATCH_SIZE at a time and written out
+# as they arrive, so memory stays flat however many appointments there are.
+# Archived appointments, when the range reaches them, come first: they are all
+# older than the hot rows.
+
+DEFAULT_BATCH_SIZE = 1000
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+_TREATMENT_KEYS = ('id', 'diagnosis', 'prescription', 'notes')
+
+CSV_COLUMNS = ([k for k in appointment_to_dict.fields if k != 'treatment']
+               + [f'treatment_{k}' for k in _TREATMENT_KEYS])
+
+
+def _batch_size():
+    return current_app.config.get('EXPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def export_rows(query):
+    """Appointment dicts for an Appointment query, oldest first, fetched in batches."""
+    projection = appointment_to_dict.sparse(list(appointment_to_dict.fields))
+    rows = (projection.apply(query)
+            .order_by(Appointment.appt_date.asc(), Appointment.appt_time.asc(), Appointment.id.asc())
+            .yield_per(_batch_size()))
+    for row in rows:
+        yield projection(row)
+
+
+def export_archived_rows(query):
+    """Appointment dicts for an ArchivedAppointment query, oldest first, fetched in batches."""
+    rows = (with_archived_names(query)
+            .order_by(ArchivedAppointment.appt_date.asc(), ArchivedAppointment.appt_time.asc(), ArchivedAppointment.id.asc())
+            .yield_per(_batch_size()))
+    for row in rows:
+        yield appointment_to_dict(row)
+
+
+def _flatten(record):
+    treatment = record.pop('treatment') or {}
+    for key in _TREATMENT_KEYS:
+        record[f'treatment_{key}'] = treatment.get(key)
+    return record
+
+
+def stream_export(query, fmt, archived_query=None):
+    """Yield the export of an Appointment query (after the matching ArchivedAppointment
+    query, if given) as text chunks of about one batch each."""
+    size = _batch_size()
+    buf = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buf, CSV_COLUMNS)
+        writer.writeheader()
+        write = lambda record: writer.writerow(_flatten(record))
+    else:
+        write = lambda record: buf.write(json.dumps(record) + '\n')
+    records = export_rows(query)
+    if archived_query is not None:
+        records = chain(export_archived_rows(archived_query), records)
+    for i, record in enumerate(records, 1):
+        write(record)
+        if i % size == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, IntegerField, SelectField, DateField, TimeField
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, IntegerField, SelectField, SelectMultipleField, DateField, TimeField
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange, Regexp
 
 class LoginForm(FlaskForm):
@@ -46,6 +46,26 @@ class AvailabilityForm(FlaskForm):
     start_time=TimeField('Start Time', format='%H:%M',validators=[DataRequired('Start Time is required')],render_kw={"required": True})
     end_time=TimeField('End Time',format='%H:%M',validators=[DataRequired('End Time is required')],render_kw={"required": True})
     submit=SubmitField("Add Slot")
+
+class AvailabilityTemplateForm(FlaskForm):
+    weekdays=SelectMultipleField('Weekdays',coerce=int,choices=[(0,'Mon'),(1,'Tue'),(2,'Wed'),(3,'Thu'),(4,'Fri'),(5,'Sat'),(6,'Sun')],validators=[DataRequired('Pick at least one weekday')])
+    start_time=TimeField('Start Time', format='%H:%M',validators=[DataRequired('Start Time is required')],render_kw={"required": True})
+    end_time=TimeField('End Time',format='%H:%M',validators=[DataRequired('End Time is required')],render_kw={"required": True})
+    valid_from=DateField('Valid From', format='%Y-%m-%d',validators=[Optional()])
+    valid_until=DateField('Valid Until', format='%Y-%m-%d',validators=[Optional()])
+    submit=SubmitField("Add Weekly Hours")
+
+class BulkAvailabilityForm(FlaskForm):
+    start_date=DateField('From', format='%Y-%m-%d',validators=[DataRequired('Start date is required')],render_kw={"required": True})
+    end_date=DateField('To', format='%Y-%m-%d',validators=[DataRequired('End date is required')],render_kw={"required": True})
+    weekdays=SelectMultipleField('Weekdays',coerce=int,choices=[(0,'Mon'),(1,'Tue'),(2,'Wed'),(3,'Thu'),(4,'Fri'),(5,'Sat'),(6,'Sun')],validators=[DataRequired('Pick at least one weekday')])
+    times=StringField('Time Ranges',validators=[DataRequired('Time ranges are required'), Length(max=255)],render_kw={"required": True,"placeholder":"09:00-12:00, 14:00-17:00"})
+    submit=SubmitField("Add Slots")
+
+class AvailabilityExceptionForm(FlaskForm):
+    date=DateField('Date', format='%Y-%m-%d',validators=[DataRequired('Date is required')],render_kw={"required": True})
+    reason=StringField('Reason',validators=[Optional(), Length(max=255)])
+    submit=SubmitField("Skip Weekly Hours")
     
 class ApptStatusForm(FlaskForm):
     status=SelectField('Status',choices=[('Booked','Booked'),('Completed','Completed'),('Cancelled','Cancelled')],validators=[DataRequired('Status is required')],render_kw={"required": True})
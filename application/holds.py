@@ -0,0 +1,105 @@
+import time as _time
+from datetime import datetime, timedelta
+from flask import current_app, request
+from sqlalchemy import update, select, or_, and_
+from application.models import db, Slot
+from application.availability import invalidate_summary, slot_is_free
+
+# --------------------------------------------------------
+# ------- Slot holds -------
+# --------------------------------------------------------
+# Picking a time reserves the slot row ('held') for SLOT_HOLD_TTL_SECONDS so
+# other patients stop seeing it; booking then just converts the caller's own
+# hold. Reads treat an expired hold as free at once (slot_is_free); the rows
+# themselves are reset in bulk by sweep_expired_holds().
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_SWEEP_SECONDS = 30
+
+_last_sweep = 0.0
+
+
+def _ttl():
+    return timedelta(seconds=current_app.config.get('SLOT_HOLD_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+
+
+def _held_keys(*conditions):
+    return {(doc_id, day) for doc_id, day in db.session.execute(
+        select(Slot.doctor_id, Slot.slot_date).where(Slot.state == 'held', *conditions).distinct())}
+
+
+def _free_held(*conditions):
+    # Returns the (doctor_id, date) pairs whose holds were released
+    keys = _held_keys(*conditions)
+    if keys:
+        db.session.execute(update(Slot).where(Slot.state == 'held', *conditions)
+                           .values(state='free', held_by=None, held_until=None)
+                           .execution_options(synchronize_session=False))
+    return keys
+
+
+def place_hold(doctor_id, day, t, patient_id):
+    """Hold one free slot for the patient, replacing any hold they have on this doctor.
+    Returns the hold expiry (UTC) or None if someone else got the slot first."""
+    now = datetime.utcnow()
+    until = now + _ttl()
+    touched = _free_held(Slot.held_by == patient_id, Slot.doctor_id == doctor_id,
+                         or_(Slot.slot_date != day, Slot.slot_time != t))
+    result = db.session.execute(
+        update(Slot)
+        .where(Slot.doctor_id == doctor_id, Slot.slot_date == day, Slot.slot_time == t,
+               or_(slot_is_free(now), and_(Slot.state == 'held', Slot.held_by == patient_id)))
+        .values(state='held', held_by=patient_id, held_until=until)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+    if result.rowcount:
+        touched.add((doctor_id, day))
+    invalidate_summary(touched)
+    return until if result.rowcount else None
+
+
+def release_holds(patient_id, doctor_id=None):
+    conditions = [Slot.held_by == patient_id]
+    if doctor_id is not None:
+        conditions.append(Slot.doctor_id == doctor_id)
+    touched = _free_held(*conditions)
+    db.session.commit()
+    invalidate_summary(touched)
+    return len(touched)
+
+
+def active_hold(patient_id, doctor_id):
+    return (Slot.query
+            .filter(Slot.state == 'held', Slot.held_by == patient_id, Slot.doctor_id == doctor_id,
+                    Slot.held_until >= datetime.utcnow())
+            .first())
+
+
+def held_by_other(doctor_id, day, t, patient_id=None):
+    # True while another patient's unexpired hold covers the slot
+    slot = Slot.query.filter_by(doctor_id=doctor_id, slot_date=day, slot_time=t, state='held').first()
+    return bool(slot and slot.held_by != patient_id and slot.held_until >= datetime.utcnow())
+
+
+def sweep_expired_holds():
+    touched = _free_held(Slot.held_until < datetime.utcnow())
+    db.session.commit()
+    invalidate_summary(touched)
+    return len(touched)
+
+
+def maybe_sweep():
+    # At most one sweep per SLOT_HOLD_SWEEP_SECONDS per worker
+    global _last_sweep
+    now = _time.monotonic()
+    if now - _last_sweep < current_app.config.get('SLOT_HOLD_SWEEP_SECONDS', DEFAULT_SWEEP_SECONDS):
+        return 0
+    _last_sweep = now
+    return sweep_expired_holds()
+
+
+def init_app(app):
+    @app.before_request
+    def _sweep_holds():
+        if request.endpoint != 'static':
+            maybe_sweep()
@@ -0,0 +1,45 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+# --------------------------------------------------------
+# ------- Sorted interval index -------
+# --------------------------------------------------------
+# Closed intervals grouped by key (e.g. (doctor_id, date)), kept merged into
+# disjoint runs sorted by start. Overlapping anything stored is the same as
+# overlapping their union, so a lookup is one bisect per key.
+
+
+class IntervalIndex:
+    def __init__(self):
+        self._starts = defaultdict(list)
+        self._ends = defaultdict(list)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows of (key, start, end)
+        index = cls()
+        for key, start, end in rows:
+            index.add(key, start, end)
+        return index
+
+    def overlaps(self, key, start, end):
+        # Touching counts as overlapping, like the single window check
+        starts = self._starts.get(key)
+        if not starts:
+            return False
+        i = bisect_right(starts, end) - 1
+        return i >= 0 and self._ends[key][i] >= start
+
+    def add(self, key, start, end):
+        starts, ends = self._starts[key], self._ends[key]
+        # runs [lo, hi) overlap or touch the new interval and are merged into it
+        lo = bisect_left(ends, start)
+        hi = bisect_right(starts, end)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi] = [end]
+
+    def __len__(self):
+        return sum(len(s) for s in self._starts.values())
@@ -0,0 +1,248 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import chain
+from sqlalchemy import event, select, delete, insert, update, inspect, bindparam
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from application.models import (db, Appointment, DoctorAvailability, Slot,
+                                AvailabilityTemplate, AvailabilityException, SlotHorizon)
+from application.schedule import DaySchedule, OCCUPYING_STATUSES
+from application.recurring import expand_windows
+
+# --------------------------------------------------------
+# ------- Slot inventory maintenance -------
+# --------------------------------------------------------
+# The `slots` table holds one row per doctor/date/time offered by a
+# DoctorAvailability window. Every flush that touches an Appointment or a
+# DoctorAvailability row re-syncs the affected (doctor_id, date) pairs on the
+# same connection, so the inventory commits or rolls back with the write.
+#
+# Weekly templates are open ended, so their slots are only materialized up to a
+# per-doctor horizon (slot_horizons) that read paths push forward on demand via
+# ensure_materialized(), in a transaction of its own so a read never commits
+# the caller's session. A template write re-syncs the doctor's days up to it.
+
+_PENDING_KEY = 'slot_inventory_keys'
+_PENDING_NEW = 'slot_inventory_new'
+_PENDING_DOCTORS = 'slot_inventory_doctors'
+
+_DATE_ATTRS = {Appointment: 'appt_date', DoctorAvailability: 'avail_date', AvailabilityException: 'exc_date'}
+
+
+def _key_of(obj):
+    return obj.doctor_id, getattr(obj, _DATE_ATTRS[type(obj)])
+
+
+def _previous_keys(obj):
+    # (doctor_id, date) pairs the object occupied before this flush (e.g. reschedule)
+    state = inspect(obj)
+    date_attr = _DATE_ATTRS[type(obj)]
+    doctor_hist = state.attrs.doctor_id.history
+    date_hist = state.attrs[date_attr].history
+    doctors = list(doctor_hist.deleted) or [obj.doctor_id]
+    days = list(date_hist.deleted) or [getattr(obj, date_attr)]
+    return {(d, dt) for d in doctors for dt in days}
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_touched_slots(session, flush_context, instances):
+    keys = session.info.setdefault(_PENDING_KEY, set())
+    new = session.info.setdefault(_PENDING_NEW, [])
+    doctors = session.info.setdefault(_PENDING_DOCTORS, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, AvailabilityTemplate):
+            # a template can touch any materialized day, re-sync the doctor up to its horizon
+            if obj in session.new:
+                new.append(obj)
+            else:
+                doctors.add(obj.doctor_id)
+                doctors.update(inspect(obj).attrs.doctor_id.history.deleted)
+            continue
+        if type(obj) not in _DATE_ATTRS:
+            continue
+        if obj in session.new:
+            # ids/dates may only be populated by the flush itself
+            new.append(obj)
+            continue
+        keys.add(_key_of(obj))
+        if obj in session.dirty:
+            keys.update(_previous_keys(obj))
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_touched_slots(session, flush_context):
+    keys = session.info.pop(_PENDING_KEY, set())
+    doctors = session.info.pop(_PENDING_DOCTORS, set())
+    for obj in session.info.pop(_PENDING_NEW, []):
+        if isinstance(obj, AvailabilityTemplate):
+            doctors.add(obj.doctor_id)
+        else:
+            keys.add(_key_of(obj))
+    doctors.discard(None)
+    if doctors:
+        keys.update(_materialized_keys(session.connection(), doctors))
+    keys = {(doc_id, day) for doc_id, day in keys if doc_id is not None and day is not None}
+    if keys:
+        sync_slots(session.connection(), keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_slots(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_PENDING_NEW, None)
+    session.info.pop(_PENDING_DOCTORS, None)
+
+
+def _day_keys(doctor_id, first, last):
+    return {(doctor_id, first + timedelta(days=i)) for i in range((last - first).days + 1)}
+
+
+def _materialized_keys(conn, doctor_ids):
+    # Every bookable day already expanded into slots for these doctors
+    tomorrow = date.today() + timedelta(days=1)
+    keys = set()
+    horizons = conn.execute(select(SlotHorizon.doctor_id, SlotHorizon.through_date)
+                            .where(SlotHorizon.doctor_id.in_(doctor_ids)))
+    for doc_id, through in horizons:
+        if through >= tomorrow:
+            keys.update(_day_keys(doc_id, tomorrow, through))
+    return keys
+
+
+def _derive(conn, doctor_ids, start, end):
+    # {(doctor_id, day): {time: appointment_id or None}} for every offered slot
+    schedules = {}
+    for doc_id, day, start_time, end_time, _ in expand_windows(conn, doctor_ids, start, end):
+        key = (doc_id, day)
+        if key not in schedules:
+            schedules[key] = DaySchedule(doc_id, day)
+        schedules[key].add_window(start_time, end_time)
+    offered = {key: dict.fromkeys(s.offered.times()) for key, s in schedules.items() if s.offered}
+    if not offered:
+        return offered
+    booked = conn.execute(
+        select(Appointment.doctor_id, Appointment.appt_date, Appointment.appt_time, Appointment.id)
+        .where(Appointment.doctor_id.in_(doctor_ids),
+               Appointment.appt_date.between(start, end),
+               Appointment.status.in_(OCCUPYING_STATUSES)))
+    for doc_id, day, t, appt_id in booked:
+        slots = offered.get((doc_id, day))
+        if slots is not None and t in slots:
+            slots[t] = appt_id
+    return offered
+
+
+def sync_slots(conn, keys):
+    """Bring the inventory rows for the given (doctor_id, date) pairs in line with
+    their availability windows and appointments, writing only the rows that changed."""
+    keys = set(keys)
+    doctor_ids = {doc_id for doc_id, _ in keys}
+    days = [day for _, day in keys]
+    derived = _derive(conn, doctor_ids, min(days), max(days))
+
+    # a range scan filtered here rather than one bound pair per key, which can run
+    # into SQLite's parameter limit when a template re-syncs months of days
+    existing = defaultdict(dict)
+    rows = conn.execute(
+        select(Slot.id, Slot.doctor_id, Slot.slot_date, Slot.slot_time, Slot.state, Slot.appointment_id)
+        .where(Slot.doctor_id.in_(doctor_ids), Slot.slot_date.between(min(days), max(days))))
+    for slot_id, doc_id, day, t, state, appt_id in rows:
+        if (doc_id, day) in keys:
+            existing[(doc_id, day)][t] = (slot_id, state, appt_id)
+
+    stale, inserts, updates = [], [], []
+    for key in keys:
+        doc_id, day = key
+        wanted = derived.get(key, {})
+        current = existing.get(key, {})
+        for t, (slot_id, state, appt_id) in current.items():
+            if t not in wanted:
+                stale.append(slot_id)
+                continue
+            new_appt = wanted[t]
+            if new_appt is not None:
+                new_state = 'booked'
+            else:
+                # holds survive a re-sync as long as the slot is still free
+                new_state = 'held' if state == 'held' else 'free'
+            if (new_state, new_appt) != (state, appt_id):
+                updates.append({'_id': slot_id, 'state': new_state, 'appointment_id': new_appt})
+        for t, appt_id in wanted.items():
+            if t not in current:
+                inserts.append({'doctor_id': doc_id, 'slot_date': day, 'slot_time': t,
+                                'state': 'booked' if appt_id else 'free', 'appointment_id': appt_id})
+
+    if stale:
+        conn.execute(delete(Slot).where(Slot.id.in_(stale)))
+    if updates:
+        # held rows never change here, so any row that does change drops its hold
+        # (e.g. the holder's own booking turns the hold into 'booked')
+        conn.execute(update(Slot).where(Slot.id == bindparam('_id'))
+                     .values(state=bindparam('state'), appointment_id=bindparam('appointment_id'),
+                             held_by=None, held_until=None),
+                     updates)
+    if inserts:
+        conn.execute(insert(Slot), inserts)
+
+
+def ensure_materialized(doctor_ids, end):
+    """Expand the doctors' weekly templates into slots through ``end``.
+    Only days past each doctor's horizon are synced; returns the number of days synced."""
+    doctor_ids = set(doctor_ids)
+    if not doctor_ids:
+        return 0
+    today = date.today()
+    try:
+        with db.engine.begin() as conn:
+            horizons = dict(conn.execute(select(SlotHorizon.doctor_id, SlotHorizon.through_date)
+                                         .where(SlotHorizon.doctor_id.in_(doctor_ids))).all())
+            behind = {doc_id for doc_id in doctor_ids if horizons.get(doc_id, today) < end}
+            if not behind:
+                return 0
+            with_templates = set(conn.execute(select(AvailabilityTemplate.doctor_id)
+                                              .where(AvailabilityTemplate.doctor_id.in_(behind))
+                                              .distinct()).scalars())
+            keys = set()
+            for doc_id in with_templates:
+                keys.update(_day_keys(doc_id, max(horizons.get(doc_id, today), today) + timedelta(days=1), end))
+            if keys:
+                sync_slots(conn, keys)
+            # one statement for every doctor; never pulls a horizon back
+            stmt = upsert(SlotHorizon).values([{'doctor_id': doc_id, 'through_date': end} for doc_id in behind])
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=['doctor_id'],
+                set_={'through_date': stmt.excluded.through_date},
+                where=SlotHorizon.through_date < stmt.excluded.through_date))
+    except IntegrityError:
+        # another worker materialized the same days first
+        return 0
+    return len(keys)
+
+
+def rebuild_inventory():
+    """Re-derive the whole inventory from availability windows and appointments.
+    Weekly templates are re-expanded lazily from scratch."""
+    conn = db.session.connection()
+    conn.execute(delete(Slot))
+    conn.execute(delete(SlotHorizon))
+    bounds = conn.execute(select(db.func.min(DoctorAvailability.avail_date),
+                                 db.func.max(DoctorAvailability.avail_date))).first()
+    doctor_ids = [r[0] for r in conn.execute(select(DoctorAvailability.doctor_id).distinct())]
+    count = 0
+    if doctor_ids and bounds[0] is not None:
+        rows = [{'doctor_id': doc_id, 'slot_date': day, 'slot_time': t,
+                 'state': 'booked' if appt_id else 'free', 'appointment_id': appt_id}
+                for (doc_id, day), slots in _derive(conn, doctor_ids, bounds[0], bounds[1]).items()
+                for t, appt_id in slots.items()]
+        if rows:
+            conn.execute(insert(Slot), rows)
+        count = len(rows)
+    db.session.commit()
+    return count
+
+
+def ensure_inventory():
+    # Backfill once for databases created before the slots table existed
+    if Slot.query.first() is None and DoctorAvailability.query.first() is not None:
+        rebuild_inventory()
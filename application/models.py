@@ -20,6 +20,11 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # prefix lookups on the normalized address (admin patient search)
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+    )
+
     def __repr__(self):
         return f"<User {self.id} name={self.name} role={self.role}>"
     
@@ -56,7 +61,7 @@ class Patient(db.Model):
     __tablename__='patients'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), unique=True, nullable=False)
-    phone = db.Column(db.String(20))
+    phone = db.Column(db.String(20), index=True)
     address = db.Column(db.String(255))
     age = db.Column(db.Integer)
     gender = db.Column(db.String(10))
@@ -90,6 +95,12 @@ class Appointment(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('doctor_id', 'appt_date', 'appt_time', name='uq_doctor_appointment'),
+        # keyset pagination order of the admin appointment list
+        db.Index('ix_appointments_date_time_id', 'appt_date', 'appt_time', 'id'),
+        # covers the doctor dashboard's "patients seen" lookup
+        db.Index('ix_appointments_doctor_patient', 'doctor_id', 'patient_id'),
+        # ids move to archived_appointments and must never be handed out again
+        {'sqlite_autoincrement': True},
     )
     def __repr__(self):
         d=self.appt_date.strftime("%Y-%m-%d") if isinstance(self.appt_date, date) else self.appt_date
@@ -107,6 +118,8 @@ class Treatment(db.Model):
 
     appointment = db.relationship('Appointment', back_populates='treatment')
 
+    __table_args__ = {'sqlite_autoincrement': True}
+
     def __repr__(self):
         return f"<Treatment {self.id} appointment={self.appointment_id}>"
     
@@ -125,4 +138,181 @@ class DoctorAvailability(db.Model):
     def __repr__(self):
         s=self.start_time.strftime('%H:%M')
         e=self.end_time.strftime('%H:%M')
-        return f"<DoctorAvailability {self.id} doctor={self.doctor_id} date={self.avail_date} {s}-{e}>"
\ No newline at end of file
+        return f"<DoctorAvailability {self.id} doctor={self.doctor_id} date={self.avail_date} {s}-{e}>"
+
+# Materialized slot inventory, one row per doctor/date/time offered by an availability window.
+# State values: 'free', 'held', 'booked'
+class Slot(db.Model):
+    __tablename__ = 'slots'
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id', ondelete='CASCADE'), nullable=False)
+    slot_date = db.Column(db.Date, nullable=False)
+    slot_time = db.Column(db.Time, nullable=False)
+    state = db.Column(db.String(10), nullable=False, default='free')
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id', ondelete='SET NULL'), nullable=True)
+    held_by = db.Column(db.Integer, db.ForeignKey('patients.id', ondelete='SET NULL'), nullable=True)
+    held_until = db.Column(db.DateTime, nullable=True)  # UTC
+
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'slot_date', 'slot_time', name='uq_doctor_slot'),
+        db.Index('ix_slots_doctor_state_date', 'doctor_id', 'state', 'slot_date', 'slot_time'),
+        db.Index('ix_slots_state_held_until', 'state', 'held_until'),
+    )
+
+    def __repr__(self):
+        t=self.slot_time.strftime('%H:%M') if isinstance(self.slot_time, time) else self.slot_time
+        return f"<Slot {self.id} doctor={self.doctor_id} date={self.slot_date} time={t} state={self.state}>"
+
+# Per-scope write counters bumped by SQLite triggers, used to keep worker-local caches coherent
+class CacheGeneration(db.Model):
+    __tablename__ = 'cache_generations'
+    scope = db.Column(db.String(40), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheGeneration {self.scope}={self.generation}>"
+
+# Generation at which each key (e.g. doctor) of a keyed scope last changed, so
+# workers can drop just that key's cache entries
+class CacheKeyGeneration(db.Model):
+    __tablename__ = 'cache_key_generations'
+    scope = db.Column(db.String(40), primary_key=True)
+    key_id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_cache_key_generations_scope_generation', 'scope', 'generation'),
+    )
+
+    def __repr__(self):
+        return f"<CacheKeyGeneration {self.scope}:{self.key_id}={self.generation}>"
+
+# Weekly recurring availability, expanded on demand (never stored per day).
+# weekdays is a bitmask: bit 0 = Monday ... bit 6 = Sunday
+class AvailabilityTemplate(db.Model):
+    __tablename__ = 'availability_templates'
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id', ondelete='CASCADE'), nullable=False, index=True)
+    weekdays = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    valid_from = db.Column(db.Date, nullable=True)
+    valid_until = db.Column(db.Date, nullable=True)
+
+    doctor = db.relationship('Doctor', backref=db.backref('availability_templates', lazy='select', cascade='all, delete-orphan'))
+
+    def applies_on(self, day):
+        if not (self.weekdays >> day.weekday()) & 1:
+            return False
+        if self.valid_from and day < self.valid_from:
+            return False
+        if self.valid_until and day > self.valid_until:
+            return False
+        return True
+
+    def __repr__(self):
+        s=self.start_time.strftime('%H:%M')
+        e=self.end_time.strftime('%H:%M')
+        return f"<AvailabilityTemplate {self.id} doctor={self.doctor_id} weekdays={self.weekdays:07b} {s}-{e}>"
+
+
+# A date on which a doctor's weekly templates do not apply (leave, holiday, ...)
+class AvailabilityException(db.Model):
+    __tablename__ = 'availability_exceptions'
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id', ondelete='CASCADE'), nullable=False)
+    exc_date = db.Column(db.Date, nullable=False)
+    reason = db.Column(db.String(255))
+
+    doctor = db.relationship('Doctor', backref=db.backref('availability_exceptions', lazy='select', cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'exc_date', name='uq_doctor_availability_exception'),
+    )
+
+    def __repr__(self):
+        return f"<AvailabilityException {self.id} doctor={self.doctor_id} date={self.exc_date}>"
+
+
+# Last date up to which a doctor's weekly templates have been expanded into `slots`
+class SlotHorizon(db.Model):
+    __tablename__ = 'slot_horizons'
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id', ondelete='CASCADE'), primary_key=True)
+    through_date = db.Column(db.Date, nullable=False)
+
+    def __repr__(self):
+        return f"<SlotHorizon doctor={self.doctor_id} through={self.through_date}>"
+
+# Running totals behind the admin dashboard, one row (id = 1). Kept current by
+# application/stats.py in the writing transaction and recounted by `flask reconcile-stats`.
+class StatCounters(db.Model):
+    __tablename__ = 'stat_counters'
+    id = db.Column(db.Integer, primary_key=True)
+    doctors = db.Column(db.Integer, nullable=False, default=0)
+    patients = db.Column(db.Integer, nullable=False, default=0)
+    appointments = db.Column(db.Integer, nullable=False, default=0)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<StatCounters doctors={self.doctors} patients={self.patients} appointments={self.appointments}>"
+
+# Appointments per day, doctor and status, for the analytics charts. department_id
+# is the doctor's current department. Maintained by application/rollups.py.
+class AppointmentDaily(db.Model):
+    __tablename__ = 'appointment_daily'
+    day = db.Column(db.Date, primary_key=True)
+    doctor_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    department_id = db.Column(db.Integer)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_appointment_daily_doctor_day', 'doctor_id', 'day'),
+        db.Index('ix_appointment_daily_department_day', 'department_id', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<AppointmentDaily {self.day} doctor={self.doctor_id} {self.status}={self.count}>"
+
+# Appointments (and their treatments) older than ARCHIVE_HORIZON_DAYS, moved out
+# of the hot tables by application/archive.py. Same ids and columns; read-only.
+class ArchivedAppointment(db.Model):
+    __tablename__ = 'archived_appointments'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id', ondelete='CASCADE'), nullable=False, index=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id', ondelete='CASCADE'), nullable=True, index=True)
+    appt_date = db.Column(db.Date, nullable=False)
+    appt_time = db.Column(db.Time, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    patient = db.relationship('Patient')
+    doctor = db.relationship('Doctor')
+    treatment = db.relationship('ArchivedTreatment', back_populates='appointment', uselist=False)
+
+    __table_args__ = (
+        db.Index('ix_archived_appointments_date_time_id', 'appt_date', 'appt_time', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedAppointment {self.id} patient={self.patient_id} doctor={self.doctor_id} date={self.appt_date} status={self.status}>"
+
+
+class ArchivedTreatment(db.Model):
+    __tablename__ = 'archived_treatments'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('archived_appointments.id', ondelete='CASCADE'), unique=True, nullable=False)
+    diagnosis = db.Column(db.Text)
+    prescription = db.Column(db.Text)
+    notes = db.Column(db.Text)
+
+    appointment = db.relationship('ArchivedAppointment', back_populates='treatment')
+
+    def __repr__(self):
+        return f"<ArchivedTreatment {self.id} appointment={self.appointment_id}>"
\ No newline at end of file
@@ -0,0 +1,64 @@
+import base64
+import json
+from datetime import date, time
+from sqlalchemy import tuple_, Date, Time
+
+# --------------------------------------------------------
+# ------- Keyset pagination -------
+# --------------------------------------------------------
+# API lists are paged by the values of their sort key rather than by offset:
+# a page is "the next `limit` rows after the last row you saw". The sort key
+# must end in a unique column (the id) so every row has exactly one position.
+# Cursors are the last row's key values, JSON in URL-safe base64; they are
+# opaque to clients and only mean something to the query that issued them.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _plain(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_plain(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Key values for ``columns`` from a cursor; ValueError if it is not one of ours."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        decoded = []
+        for column, value in zip(columns, values):
+            if isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+            elif isinstance(column.type, Time):
+                value = time.fromisoformat(value)
+            decoded.append(value)
+        return tuple(decoded)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """One page of ``query`` ordered by ``columns`` (all in the same direction).
+    ``cursor`` comes from the previous page. Returns (rows, next_cursor or None);
+    rows are entities for an entity query, tuples for a column query."""
+    key = tuple_(*columns)
+    if cursor:
+        after = decode_cursor(cursor, columns)
+        query = query.filter(key < after if descending else key > after)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    # the key travels with each row, so the cursor needs no extra lookups
+    described = query.column_descriptions
+    width = len(described)
+    rows = query.add_columns(*columns).order_by(*order).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1][width:]) if len(rows) > limit else None
+    if width == 1 and described[0]['expr'] is described[0]['entity']:
+        return [r[0] for r in rows[:limit]], next_cursor
+    return [r[:width] for r in rows[:limit]], next_cursor
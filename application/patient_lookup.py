@@ -0,0 +1,122 @@
+import re
+from sqlalchemy import text, select, func, or_, table, column, literal_column
+from sqlalchemy.exc import OperationalError
+from application.models import db, Patient, User
+
+# --------------------------------------------------------
+# ------- Patient lookup -------
+# --------------------------------------------------------
+# Admin patient search, routed by the shape of what was typed so every branch
+# is served by an index:
+#   "42", "98765 43210", "+91 98765-43210" -> patient id / phone equality
+#   "asha@", "asha.k@mail"                 -> prefix range on lower(email)
+#   anything else                          -> name substring through an FTS5
+#                                             trigram index, or email prefix
+# The trigram table `patient_search` (rowid = patients.id) is kept in sync by
+# SQLite triggers. Builds without FTS5 trigram fall back to ILIKE on the name.
+
+FTS_TABLE = 'patient_search'
+
+# trigram needs at least three characters to use the index
+_MIN_TRIGRAM = 3
+
+_fts = table(FTS_TABLE, column('rowid'))
+_available = None
+
+_NUMBER = re.compile(r'^\+?[\d\s().-]+$')
+
+_ROW_SELECT = "SELECT p.id, u.name FROM patients p JOIN users u ON u.id = p.user_id"
+
+_TRIGGERS = {
+    'trg_patient_search_patients_insert':
+        f"AFTER INSERT ON patients BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) {_ROW_SELECT} WHERE p.id = NEW.id; END",
+    'trg_patient_search_patients_update':
+        f"AFTER UPDATE OF user_id ON patients BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) {_ROW_SELECT} WHERE p.id = NEW.id; END",
+    'trg_patient_search_patients_delete':
+        f"AFTER DELETE ON patients BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; END",
+    'trg_patient_search_users_update':
+        f"AFTER UPDATE OF name ON users WHEN NEW.role = 'patient' BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM patients WHERE user_id = NEW.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) {_ROW_SELECT} WHERE p.user_id = NEW.id; END",
+}
+
+
+def query_shape(q):
+    """Classify a search string: ('number', digits), ('email', prefix) or ('name', q)."""
+    if _NUMBER.match(q) and any(c.isdigit() for c in q):
+        return 'number', re.sub(r'\D', '', q)
+    if '@' in q:
+        return 'email', q.lower()
+    return 'name', q
+
+
+def _email_prefix(prefix):
+    # lower(email) >= 'asha' AND lower(email) < 'ashb' walks ix_users_email_lower
+    lowered = func.lower(User.email)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (lowered >= prefix) & (lowered < upper)
+
+
+def _name_match(q):
+    if not _available or len(q) < _MIN_TRIGRAM:
+        return User.name.ilike(f'%{q}%')
+    phrase = '"' + q.replace('"', '""') + '"'
+    return Patient.id.in_(select(_fts.c.rowid).where(literal_column(FTS_TABLE).op('MATCH')(phrase)))
+
+
+def lookup_patients(q):
+    """Query of Patient (joined to User) matching q."""
+    query = db.session.query(Patient).join(User, Patient.user_id == User.id)
+    q = q.strip()
+    if not q:
+        return query
+    shape, value = query_shape(q)
+    if shape == 'number':
+        conditions = [Patient.phone == value[-10:]]
+        if len(value) < 10:
+            conditions.append(Patient.id == int(value))
+        return query.filter(or_(*conditions))
+    if shape == 'email':
+        return query.filter(_email_prefix(value))
+    return query.filter(or_(_name_match(value), _email_prefix(value.lower())))
+
+
+def rebuild_index():
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}(rowid, name) {_ROW_SELECT}"))
+    db.session.commit()
+    return db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+def install_index():
+    global _available
+    # create_all() does not add indexes to tables that already exist; checked by
+    # name since SQLAlchemy cannot reflect the lower(email) expression index
+    existing = {r[0] for r in db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    for model in (Patient, User):
+        for index in model.__table__.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+    try:
+        db.session.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, tokenize = 'trigram')"))
+    except OperationalError:
+        # SQLite without FTS5 or older than 3.34 (no trigram tokenizer)
+        db.session.rollback()
+        _available = False
+        return False
+    for name, body in _TRIGGERS.items():
+        db.session.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+    db.session.commit()
+    _available = True
+    indexed = db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+    if indexed != db.session.query(func.count(Patient.id)).scalar():
+        rebuild_index()
+    return True
+
+
+def init_app(app):
+    with app.app_context():
+        install_index()
@@ -0,0 +1,123 @@
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import select, or_
+from application.models import db, DoctorAvailability, AvailabilityTemplate, AvailabilityException
+
+# --------------------------------------------------------
+# ------- Recurring weekly availability -------
+# --------------------------------------------------------
+# Doctors can publish weekly templates ("Mon-Fri 09:00-13:00") plus dates on
+# which the templates do not apply. Templates are expanded for the requested
+# date window only; the explicit per-date DoctorAvailability rows still add to
+# whatever the templates offer.
+
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def weekday_mask(weekdays):
+    mask = 0
+    for wd in weekdays:
+        mask |= 1 << int(wd)
+    return mask
+
+
+def describe_weekdays(mask):
+    # 0b0011111 -> "Mon-Fri", 0b0010101 -> "Mon, Wed, Fri"
+    days = [i for i in range(7) if mask >> i & 1]
+    if len(days) > 2 and days == list(range(days[0], days[-1] + 1)):
+        return f"{WEEKDAY_NAMES[days[0]]}-{WEEKDAY_NAMES[days[-1]]}"
+    return ", ".join(WEEKDAY_NAMES[i] for i in days)
+
+
+def _days(start, end):
+    for i in range((end - start).days + 1):
+        yield start + timedelta(days=i)
+
+
+def expand_windows(conn, doctor_ids, start, end):
+    """Yield (doctor_id, date, start_time, end_time, source) for every availability
+    window between start and end: explicit per-date rows first, then templates."""
+    doctor_ids = list(doctor_ids)
+    if not doctor_ids or end < start:
+        return
+    explicit = conn.execute(
+        select(DoctorAvailability.doctor_id, DoctorAvailability.avail_date,
+               DoctorAvailability.start_time, DoctorAvailability.end_time)
+        .where(DoctorAvailability.doctor_id.in_(doctor_ids),
+               DoctorAvailability.avail_date.between(start, end)))
+    for doc_id, day, start_time, end_time in explicit:
+        yield doc_id, day, start_time, end_time, 'date'
+
+    templates = conn.execute(
+        select(AvailabilityTemplate.doctor_id, AvailabilityTemplate.weekdays,
+               AvailabilityTemplate.start_time, AvailabilityTemplate.end_time,
+               AvailabilityTemplate.valid_from, AvailabilityTemplate.valid_until)
+        .where(AvailabilityTemplate.doctor_id.in_(doctor_ids),
+               or_(AvailabilityTemplate.valid_from.is_(None), AvailabilityTemplate.valid_from <= end),
+               or_(AvailabilityTemplate.valid_until.is_(None), AvailabilityTemplate.valid_until >= start))).all()
+    if not templates:
+        return
+    skipped = set(conn.execute(
+        select(AvailabilityException.doctor_id, AvailabilityException.exc_date)
+        .where(AvailabilityException.doctor_id.in_({t[0] for t in templates}),
+               AvailabilityException.exc_date.between(start, end))).all())
+    for doc_id, weekdays, start_time, end_time, valid_from, valid_until in templates:
+        first = max(start, valid_from) if valid_from else start
+        last = min(end, valid_until) if valid_until else end
+        for day in _days(first, last):
+            if weekdays >> day.weekday() & 1 and (doc_id, day) not in skipped:
+                yield doc_id, day, start_time, end_time, 'weekly'
+
+
+def fold_repeating_rows(min_weeks=3, dry_run=False):
+    """Migration: replace runs of DoctorAvailability rows that repeat on the same
+    weekday and hours for at least `min_weeks` consecutive weeks with templates
+    bounded to exactly the dates they covered. Runs over the same weeks and hours
+    on several weekdays are merged into one template. Returns the templates."""
+    # a date with an exception would suppress the template, so rows on it stay explicit
+    excepted = set(db.session.query(AvailabilityException.doctor_id, AvailabilityException.exc_date).all())
+    by_pattern = defaultdict(list)
+    for row in DoctorAvailability.query.order_by(DoctorAvailability.avail_date.asc()).all():
+        if (row.doctor_id, row.avail_date) not in excepted:
+            by_pattern[(row.doctor_id, row.avail_date.weekday(), row.start_time, row.end_time)].append(row)
+
+    # (doctor_id, start, end, first monday, last monday) -> [(weekday, rows)]
+    runs = defaultdict(list)
+    for (doc_id, weekday, start_time, end_time), rows in by_pattern.items():
+        run = []
+        for row in rows:
+            if run and run[-1].avail_date == row.avail_date:
+                continue  # exact duplicate row, left as is
+            if run and (row.avail_date - run[-1].avail_date).days != 7:
+                _add_run(runs, doc_id, weekday, start_time, end_time, run, min_weeks)
+                run = []
+            run.append(row)
+        _add_run(runs, doc_id, weekday, start_time, end_time, run, min_weeks)
+
+    templates = []
+    for (doc_id, start_time, end_time, _, _), members in runs.items():
+        rows = [r for _, run in members for r in run]
+        template = AvailabilityTemplate(
+            doctor_id=doc_id,
+            weekdays=weekday_mask(wd for wd, _ in members),
+            start_time=start_time,
+            end_time=end_time,
+            valid_from=min(r.avail_date for r in rows),
+            valid_until=max(r.avail_date for r in rows),
+        )
+        templates.append(template)
+        if not dry_run:
+            db.session.add(template)
+            for r in rows:
+                db.session.delete(r)
+    if not dry_run:
+        db.session.commit()
+    return templates
+
+
+def _add_run(runs, doc_id, weekday, start_time, end_time, run, min_weeks):
+    if len(run) < min_weeks:
+        return
+    first_monday = run[0].avail_date - timedelta(days=weekday)
+    last_monday = run[-1].avail_date - timedelta(days=weekday)
+    runs[(doc_id, start_time, end_time, first_monday, last_monday)].append((weekday, run))
@@ -0,0 +1,173 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from sqlalchemy import event, inspect, select, update, delete, insert, func, union_all
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.orm import Session
+from application.models import db, Doctor, Department, User, Appointment, ArchivedAppointment, AppointmentDaily
+
+# --------------------------------------------------------
+# ------- Daily appointment rollups -------
+# --------------------------------------------------------
+# Status charts and the analytics time series read appointment_daily, one row
+# per (day, doctor, status) with the doctor's department alongside, instead of
+# grouping the appointments table on every render. ORM flushes apply their net
+# change on the same connection, like the dashboard counters (stats.py); bulk
+# writers pass their changes to adjust(). Appointments without a doctor are not
+# counted. `flask rebuild-rollups` recomputes the table from scratch, archived
+# appointments included.
+
+GROUPS = ('department', 'doctor', 'status')
+
+
+# Keep the previous day and doctor of an appointment being moved, so the flush
+# can take it out of the row it used to count in (status is kept by stats.py)
+@event.listens_for(Appointment.appt_date, 'set', active_history=True)
+@event.listens_for(Appointment.doctor_id, 'set', active_history=True)
+def _keep_previous_key(target, value, oldvalue, initiator):
+    pass
+
+
+def _previous(obj, name):
+    history = inspect(obj).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, name)
+
+
+def _previous_key(obj):
+    return _previous(obj, 'appt_date'), _previous(obj, 'doctor_id'), _previous(obj, 'status')
+
+
+def _key(obj):
+    return obj.appt_date, obj.doctor_id, obj.status
+
+
+@event.listens_for(Session, 'after_flush')
+def _roll_up_flushed_changes(session, flush_context):
+    deltas = Counter()
+    moved = {}
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            deltas[_key(obj)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            deltas[_previous_key(obj)] -= 1
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        if isinstance(obj, Appointment):
+            before, after = _previous_key(obj), _key(obj)
+            if before != after:
+                deltas[before] -= 1
+                deltas[after] += 1
+        elif isinstance(obj, Doctor):
+            history = inspect(obj).attrs.department_id.history
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                moved[obj.id] = history.added[0]
+    conn = session.connection()
+    for doctor_id, department_id in moved.items():
+        conn.execute(update(AppointmentDaily).where(AppointmentDaily.doctor_id == doctor_id)
+                     .values(department_id=department_id))
+    adjust(conn, deltas)
+
+
+def adjust(conn, deltas):
+    """Add ``deltas`` ({(day, doctor_id, status): change}) to the rollups inside
+    the caller's transaction."""
+    deltas = {k: v for k, v in deltas.items() if v and k[0] is not None and k[1] is not None and k[2]}
+    if not deltas:
+        return
+    doctor_ids = {doctor_id for _, doctor_id, _ in deltas}
+    departments = dict(conn.execute(
+        select(Doctor.id, Doctor.department_id).where(Doctor.id.in_(doctor_ids))).all())
+    rows = [dict(day=day, doctor_id=doctor_id, status=status,
+                 department_id=departments.get(doctor_id), count=change)
+            for (day, doctor_id, status), change in deltas.items()]
+    stmt = upsert(AppointmentDaily)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=['day', 'doctor_id', 'status'],
+        set_={'count': AppointmentDaily.count + stmt.excluded.count}), rows)
+
+
+def key_deltas(removed=(), added=()):
+    """Rollup changes for appointments leaving the ``removed`` (day, doctor_id,
+    status) keys and entering the ``added`` ones."""
+    deltas = Counter()
+    for key in removed:
+        deltas[key] -= 1
+    for key in added:
+        deltas[key] += 1
+    return deltas
+
+
+def rebuild():
+    """Recompute every rollup row from the hot and archived appointments. Returns the row count."""
+    rows = union_all(*(select(m.appt_date.label('day'), m.doctor_id, m.status).where(m.doctor_id.is_not(None))
+                       for m in (Appointment, ArchivedAppointment))).subquery()
+    db.session.execute(delete(AppointmentDaily))
+    db.session.execute(insert(AppointmentDaily).from_select(
+        ['day', 'doctor_id', 'status', 'department_id', 'count'],
+        select(rows.c.day, rows.c.doctor_id, rows.c.status, Doctor.department_id, func.count())
+        .outerjoin(Doctor, rows.c.doctor_id == Doctor.id)
+        .group_by(rows.c.day, rows.c.doctor_id, rows.c.status, Doctor.department_id)))
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(AppointmentDaily)).scalar()
+
+
+def status_totals(doctor_id=None, start=None, end=None):
+    """{status: count} over the rollups, optionally for one doctor and a date range."""
+    q = select(AppointmentDaily.status, func.sum(AppointmentDaily.count)).group_by(AppointmentDaily.status)
+    if doctor_id is not None:
+        q = q.where(AppointmentDaily.doctor_id == doctor_id)
+    if start is not None:
+        q = q.where(AppointmentDaily.day >= start)
+    if end is not None:
+        q = q.where(AppointmentDaily.day <= end)
+    return {status: total for status, total in db.session.execute(q).all() if total}
+
+
+def _labels(group, keys):
+    if group == 'status':
+        return {k: k for k in keys}
+    if group == 'department':
+        q = select(Department.id, Department.name).where(Department.id.in_(keys))
+    else:
+        q = select(Doctor.id, User.name).join(User, Doctor.user_id == User.id).where(Doctor.id.in_(keys))
+    return dict(db.session.execute(q).all())
+
+
+def daily_series(start, end, group='department', doctor_id=None, department_id=None, status=None):
+    """Appointments per day from ``start`` to ``end`` (inclusive), one series per
+    department, doctor or status. Every series has a point for every day."""
+    column = {'department': AppointmentDaily.department_id,
+              'doctor': AppointmentDaily.doctor_id,
+              'status': AppointmentDaily.status}[group]
+    q = (select(column, AppointmentDaily.day, func.sum(AppointmentDaily.count))
+         .where(AppointmentDaily.day.between(start, end))
+         .group_by(column, AppointmentDaily.day))
+    if doctor_id is not None:
+        q = q.where(AppointmentDaily.doctor_id == doctor_id)
+    if department_id is not None:
+        q = q.where(AppointmentDaily.department_id == department_id)
+    if status is not None:
+        q = q.where(AppointmentDaily.status == status)
+    counts = defaultdict(dict)
+    for key, day, total in db.session.execute(q).all():
+        if total:
+            counts[key][day] = total
+    labels = _labels(group, [k for k in counts if k is not None])
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return [{
+        'key': key,
+        'name': labels.get(key),
+        'total': sum(by_day.values()),
+        'points': [{'date': d.isoformat(), 'count': by_day.get(d, 0)} for d in days],
+    } for key, by_day in sorted(counts.items(), key=lambda kv: (labels.get(kv[0]) is None, labels.get(kv[0]) or '', str(kv[0])))]
+
+
+def init_app(app):
+    # First start after the table appears: fill it from the existing appointments
+    with app.app_context():
+        empty = db.session.execute(select(AppointmentDaily.day).limit(1)).first() is None
+        if empty and db.session.execute(select(Appointment.id).limit(1)).first() is not None:
+            rebuild()
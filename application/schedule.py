@@ -0,0 +1,122 @@
+from datetime import time
+
+# --------------------------------------------------------
+# ------- Bitmap day schedules -------
+# --------------------------------------------------------
+# A doctor's day is stored as one int where bit m means "a slot starts at
+# minute m after midnight". Availability windows are not aligned to :00/:30
+# (a window may start at 08:11), so bits are per minute rather than per
+# half hour; Python ints make the 1440-bit width free.
+
+SLOT_MINUTES = 30
+MINUTES_PER_DAY = 24 * 60
+
+# Appointment statuses that take their slot out of the free pool
+OCCUPYING_STATUSES = ('Booked', 'Completed')
+
+_MINUTE_TIMES = tuple(time(m // 60, m % 60) for m in range(MINUTES_PER_DAY))
+_STRIDE = sum(1 << (SLOT_MINUTES * k) for k in range(MINUTES_PER_DAY // SLOT_MINUTES))
+
+
+def _minute_of(t):
+    return t.hour * 60 + t.minute
+
+
+class SlotBitmap:
+    __slots__ = ('bits',)
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    @classmethod
+    def from_window(cls, start_time, end_time):
+        # Slot starts every 30 minutes from start_time while the slot still ends by end_time
+        start = _minute_of(start_time)
+        count = (_minute_of(end_time) - start) // SLOT_MINUTES
+        if count <= 0:
+            return cls()
+        return cls((_STRIDE & ((1 << (SLOT_MINUTES * (count - 1) + 1)) - 1)) << start)
+
+    @classmethod
+    def from_times(cls, times):
+        bits = 0
+        for t in times:
+            bits |= 1 << _minute_of(t)
+        return cls(bits)
+
+    @classmethod
+    def union(cls, bitmaps):
+        bits = 0
+        for b in bitmaps:
+            bits |= b.bits
+        return cls(bits)
+
+    def __or__(self, other):
+        return SlotBitmap(self.bits | other.bits)
+
+    def __and__(self, other):
+        return SlotBitmap(self.bits & other.bits)
+
+    def __sub__(self, other):
+        return SlotBitmap(self.bits & ~other.bits)
+
+    def __eq__(self, other):
+        return isinstance(other, SlotBitmap) and self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __contains__(self, t):
+        return bool(self.bits >> _minute_of(t) & 1)
+
+    def overlaps(self, other):
+        return (self.bits & other.bits) != 0
+
+    def minutes(self):
+        # Peel off the lowest set bit each round: cost scales with slots, not with the 1440-bit width
+        out = []
+        bits = self.bits
+        while bits:
+            low = bits & -bits
+            out.append(low.bit_length() - 1)
+            bits ^= low
+        return out
+
+    def times(self):
+        return [_MINUTE_TIMES[m] for m in self.minutes()]
+
+    def __repr__(self):
+        return f"<SlotBitmap {len(self)} slots>"
+
+
+class DaySchedule:
+    # Offered and occupied slot starts for one doctor on one date
+    __slots__ = ('doctor_id', 'day', 'offered', 'occupied')
+
+    def __init__(self, doctor_id, day):
+        self.doctor_id = doctor_id
+        self.day = day
+        self.offered = SlotBitmap()
+        self.occupied = SlotBitmap()
+
+    def add_window(self, start_time, end_time):
+        self.offered = self.offered | SlotBitmap.from_window(start_time, end_time)
+
+    def occupy(self, t):
+        self.occupied = self.occupied | SlotBitmap.from_times((t,))
+
+    @property
+    def free(self):
+        return self.offered - self.occupied
+
+    def free_count(self):
+        return len(self.free)
+
+    def __repr__(self):
+        return f"<DaySchedule doctor={self.doctor_id} date={self.day} free={self.free_count()}/{len(self.offered)}>"
@@ -0,0 +1,114 @@
+import re
+from sqlalchemy import text, select, func, or_, table, column, literal_column
+from sqlalchemy.exc import OperationalError
+from application.models import db, Doctor, User
+
+# --------------------------------------------------------
+# ------- Doctor full-text search -------
+# --------------------------------------------------------
+# An FTS5 table `doctor_search` (rowid = doctors.id) indexes doctor name,
+# specialization and department name. SQLite triggers on doctors, users and
+# departments keep it in sync with every write, ORM or not. Each query word is
+# matched as a prefix and hits are ranked by bm25, a name hit weighing most.
+# Builds without FTS5 fall back to the old substring filter.
+
+FTS_TABLE = 'doctor_search'
+
+# bm25 column weights: name, specialization, department
+_WEIGHTS = (10.0, 5.0, 2.0)
+
+_fts = table(FTS_TABLE, column('rowid'))
+_available = None
+
+_ROW_SELECT = (
+    "SELECT d.id, u.name, coalesce(d.specialization, ''), coalesce(dep.name, '') "
+    "FROM doctors d JOIN users u ON u.id = d.user_id "
+    "LEFT JOIN departments dep ON dep.id = d.department_id"
+)
+
+_TRIGGERS = {
+    'trg_doctor_search_doctors_insert':
+        f"AFTER INSERT ON doctors BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, specialization, department) {_ROW_SELECT} WHERE d.id = NEW.id; END",
+    'trg_doctor_search_doctors_update':
+        f"AFTER UPDATE OF user_id, specialization, department_id ON doctors BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, specialization, department) {_ROW_SELECT} WHERE d.id = NEW.id; END",
+    'trg_doctor_search_doctors_delete':
+        f"AFTER DELETE ON doctors BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = OLD.id; END",
+    'trg_doctor_search_users_update':
+        f"AFTER UPDATE OF name ON users WHEN NEW.role = 'doctor' BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM doctors WHERE user_id = NEW.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, specialization, department) {_ROW_SELECT} WHERE d.user_id = NEW.id; END",
+    'trg_doctor_search_departments_update':
+        f"AFTER UPDATE OF name ON departments BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM doctors WHERE department_id = NEW.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, specialization, department) {_ROW_SELECT} WHERE d.department_id = NEW.id; END",
+    'trg_doctor_search_departments_delete':
+        f"AFTER DELETE ON departments BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM doctors WHERE department_id = OLD.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name, specialization, department) {_ROW_SELECT} WHERE d.department_id = OLD.id; END",
+}
+
+
+def match_expression(q):
+    # "card smi" -> '"card"* "smi"*' (every word, as a prefix); None if q has no words
+    words = re.findall(r'\w+', q.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def doctor_match(q):
+    """Subquery of (doctor_id, rank) for the doctors matching q, lower rank = better.
+    Join it to a Doctor query and order by its rank column."""
+    expr = match_expression(q) or '""'
+    return (select(_fts.c.rowid.label('doctor_id'),
+                   func.bm25(literal_column(FTS_TABLE), *_WEIGHTS).label('rank'))
+            .where(literal_column(FTS_TABLE).op('MATCH')(expr))
+            .subquery('doctor_match'))
+
+
+def filter_doctors(query, q):
+    """Restrict a query that already joins Doctor and User to doctors matching q.
+    Returns (query, rank column or None); order by the rank to list best hits first."""
+    if not _available:
+        like = f'%{q}%'
+        return query.filter(or_(User.name.ilike(like), Doctor.specialization.ilike(like))), None
+    if match_expression(q) is None:
+        return query.filter(db.false()), None
+    match = doctor_match(q)
+    return query.join(match, match.c.doctor_id == Doctor.id), match.c.rank
+
+
+def rebuild_index():
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}(rowid, name, specialization, department) {_ROW_SELECT}"))
+    db.session.commit()
+    return db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+def install_index():
+    global _available
+    try:
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"name, specialization, department, tokenize = 'unicode61 remove_diacritics 2')"))
+    except OperationalError:
+        # SQLite built without FTS5
+        db.session.rollback()
+        _available = False
+        return False
+    for name, body in _TRIGGERS.items():
+        db.session.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+    db.session.commit()
+    _available = True
+    indexed = db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+    if indexed != db.session.query(func.count(Doctor.id)).scalar():
+        rebuild_index()
+    return True
+
+
+def init_app(app):
+    with app.app_context():
+        install_index()
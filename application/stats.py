@@ -0,0 +1,130 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, func
+from sqlalchemy.dialects.sqlite import insert as upsert
+from sqlalchemy.orm import Session
+from application.models import db, Doctor, Patient, Appointment, ArchivedAppointment, StatCounters
+
+# --------------------------------------------------------
+# ------- Dashboard counters -------
+# --------------------------------------------------------
+# The admin dashboard reads one row of running totals instead of counting the
+# doctors, patients and appointments tables on every load. Every ORM flush
+# that adds or removes one of those rows, or changes an appointment's status,
+# applies its net change to the row on the same connection, so the counts
+# commit or roll back with the write. Writes that skip the ORM (bulk
+# statements, other tools) either call adjust() themselves or are caught by
+# reconcile(), which recounts everything on `flask reconcile-stats` (schedule
+# it; it is never run from a request). Archived appointments still count.
+
+ROW_ID = 1
+
+# appointment status -> counter column
+STATUS_COLUMNS = {'Booked': 'booked', 'Completed': 'completed', 'Cancelled': 'cancelled'}
+
+_ENTITY_COLUMNS = {Doctor: 'doctors', Patient: 'patients', Appointment: 'appointments'}
+
+
+# Load the previous status when it is overwritten, so a flush can tell which
+# counter the appointment leaves even if the attribute had been expired
+@event.listens_for(Appointment.status, 'set', active_history=True)
+def _keep_previous_status(target, value, oldvalue, initiator):
+    pass
+
+
+def _previous_status(obj):
+    history = inspect(obj).attrs.status.history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else obj.status
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed_changes(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        column = _ENTITY_COLUMNS.get(type(obj))
+        if column:
+            deltas[column] += 1
+            if isinstance(obj, Appointment):
+                deltas[STATUS_COLUMNS.get(obj.status)] += 1
+    for obj in session.deleted:
+        column = _ENTITY_COLUMNS.get(type(obj))
+        if column:
+            deltas[column] -= 1
+            if isinstance(obj, Appointment):
+                deltas[STATUS_COLUMNS.get(_previous_status(obj))] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and obj not in session.deleted:
+            history = inspect(obj).attrs.status.history
+            if history.added and history.deleted and history.added[0] != history.deleted[0]:
+                deltas[STATUS_COLUMNS.get(history.deleted[0])] -= 1
+                deltas[STATUS_COLUMNS.get(history.added[0])] += 1
+    adjust(session.connection(), deltas)
+
+
+def adjust(conn, deltas):
+    """Add ``deltas`` ({column: change}) to the counters inside the caller's transaction."""
+    values = {column: getattr(StatCounters, column) + change
+              for column, change in deltas.items() if column and change}
+    if values:
+        conn.execute(update(StatCounters).where(StatCounters.id == ROW_ID).values(**values))
+
+
+def status_deltas(removed=(), added=()):
+    """Counter changes for appointments leaving the ``removed`` statuses and
+    entering the ``added`` ones (pass None for a row that did not exist)."""
+    deltas = Counter()
+    for status in removed:
+        deltas[STATUS_COLUMNS.get(status)] -= 1
+        deltas['appointments'] -= 1
+    for status in added:
+        deltas[STATUS_COLUMNS.get(status)] += 1
+        deltas['appointments'] += 1
+    return deltas
+
+
+def snapshot():
+    """The counter row (reconciled first if it has never been filled)."""
+    row = db.session.get(StatCounters, ROW_ID)
+    if row is None:
+        row = reconcile()
+    return row
+
+
+def _appointment_count(status=None):
+    # hot plus archived appointments, optionally with one status, as a scalar subquery
+    total = None
+    for model in (Appointment, ArchivedAppointment):
+        query = select(func.count(model.id))
+        if status is not None:
+            query = query.where(model.status == status)
+        total = query.scalar_subquery() if total is None else total + query.scalar_subquery()
+    return total
+
+
+def reconcile():
+    """Recount every counter from the tables and store the result. Returns the row.
+    The counts and the write are one statement, so an adjust() committed by a
+    concurrent writer is either included in the recount or applied after it."""
+    counts = {
+        'doctors': select(func.count(Doctor.id)).scalar_subquery(),
+        'patients': select(func.count(Patient.id)).scalar_subquery(),
+        'appointments': _appointment_count(),
+        **{column: _appointment_count(status) for status, column in STATUS_COLUMNS.items()},
+        'reconciled_at': datetime.utcnow(),
+    }
+    stmt = upsert(StatCounters).values(id=ROW_ID, **counts)
+    row = db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['id'], set_={column: stmt.excluded[column] for column in counts})
+        .returning(*StatCounters.__table__.columns)).one()
+    db.session.commit()
+    return row
+
+
+def init_app(app):
+    # Fill the row once for a new database; after that the counters are only
+    # recounted by `flask reconcile-stats` (run it from cron after bulk imports)
+    with app.app_context():
+        if db.session.get(StatCounters, ROW_ID) is None:
+            reconcile()
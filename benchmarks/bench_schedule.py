@@ -0,0 +1,83 @@
+# Micro-benchmark: legacy set()/datetime.combine slot derivation vs SlotBitmap.
+# Run from the repo root:  python benchmarks/bench_schedule.py
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from application.schedule import DaySchedule, SlotBitmap  # noqa: E402
+
+DOCTORS = 300
+DAYS = 7
+REPEAT = 5
+
+
+def legacy_free_slots(target_date, windows, occupied):
+    slots_set = set()
+    for start_time, end_time in windows:
+        current_dt = datetime.combine(target_date, start_time)
+        end_dt = datetime.combine(target_date, end_time)
+        while current_dt + timedelta(minutes=30) <= end_dt:
+            slots_set.add(current_dt.time())
+            current_dt += timedelta(minutes=30)
+    return sorted(t for t in slots_set if t not in occupied)
+
+
+def bitmap_free_slots(target_date, windows, occupied):
+    schedule = DaySchedule(None, target_date)
+    for start_time, end_time in windows:
+        schedule.add_window(start_time, end_time)
+    for t in occupied:
+        schedule.occupy(t)
+    return schedule.free.times()
+
+
+def bitmap_free_count(target_date, windows, occupied):
+    offered = SlotBitmap.union(SlotBitmap.from_window(s, e) for s, e in windows)
+    return len(offered - SlotBitmap.from_times(occupied))
+
+
+def make_workload(seed=7):
+    rng = random.Random(seed)
+    start = date.today() + timedelta(days=1)
+    work = []
+    for _ in range(DOCTORS):
+        for d in range(DAYS):
+            day = start + timedelta(days=d)
+            windows = []
+            for h in rng.sample(range(7, 20, 4), 2):
+                st = time(h, rng.choice([0, 11, 30, 45]))
+                et = (datetime.combine(day, st) + timedelta(minutes=rng.choice([120, 180, 240]))).time()
+                windows.append((st, et))
+            offered = legacy_free_slots(day, windows, set())
+            occupied = set(rng.sample(offered, min(len(offered), rng.randint(0, 6))))
+            work.append((day, windows, occupied))
+    return work
+
+
+def run(fn, work):
+    return [fn(day, windows, occupied) for day, windows, occupied in work]
+
+
+def main():
+    work = make_workload()
+    assert run(legacy_free_slots, work) == run(bitmap_free_slots, work)
+    assert [len(x) for x in run(legacy_free_slots, work)] == run(bitmap_free_count, work)
+
+    cases = [
+        ("legacy set/datetime.combine", legacy_free_slots),
+        ("bitmap -> times", bitmap_free_slots),
+        ("bitmap popcount only", bitmap_free_count),
+    ]
+    print(f"{DOCTORS} doctors x {DAYS} days, best of {REPEAT}")
+    baseline = None
+    for label, fn in cases:
+        best = min(timeit.repeat(lambda: run(fn, work), number=1, repeat=REPEAT))
+        baseline = baseline or best
+        print(f"  {label:<30} {best * 1000:8.2f} ms  ({baseline / best:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()